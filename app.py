@@ -5,19 +5,23 @@ Includes an AI chatbot powered by OpenAI GPT for natural language music requests
 """
 
 import streamlit as st
-import spotipy
-from spotipy.oauth2 import SpotifyOAuth, SpotifyClientCredentials
 import os
 import re
-from dotenv import load_dotenv
-from openai import OpenAI
+import threading
+import time
+from collections import Counter, deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from html import escape
+import numpy as np
 import json
 
-# Load environment variables from .env file
-load_dotenv()
+# Load environment variables from .env file (only present in local development)
+if os.path.isfile(".env"):
+    from dotenv import load_dotenv
+    load_dotenv()
 
-# Initialize OpenAI client
-openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# OAuth callback URL (fixed for the lifetime of the deployment)
+SPOTIPY_REDIRECT_URI = os.getenv("SPOTIPY_REDIRECT_URI")
 
 # Page configuration
 st.set_page_config(
@@ -72,6 +76,82 @@ MOOD_PRESETS = {
     }
 }
 
+# GPT models offered in the sidebar (display label and pricing/speed note)
+GPT_MODEL_OPTIONS = {
+    "gpt-3.5-turbo": "GPT-3.5 Turbo (Fast & Cheap)",
+    "gpt-4": "GPT-4 (Most Accurate)",
+    "gpt-4-turbo": "GPT-4 Turbo (Fast & Smart)",
+    "gpt-4o": "GPT-4o (Latest & Best)",
+    "gpt-4o-mini": "GPT-4o Mini (Balanced)"
+}
+GPT_MODEL_NAMES = tuple(GPT_MODEL_OPTIONS)
+GPT_MODEL_INFO = {
+    "gpt-3.5-turbo": "💰 ~$0.002/1K tokens | ⚡ Fastest | Good for most requests",
+    "gpt-4": "💰 ~$0.03/1K tokens | 🎯 Most accurate | Best understanding",
+    "gpt-4-turbo": "💰 ~$0.01/1K tokens | ⚡ Fast | Great balance",
+    "gpt-4o": "💰 ~$0.005/1K tokens | 🚀 Latest | Best overall",
+    "gpt-4o-mini": "💰 ~$0.0015/1K tokens | ⚡ Fast | Cost-effective"
+}
+
+# Presets flattened into parallel arrays: one row per mood, columns in FEATURE_KEYS order
+FEATURE_KEYS = ("valence", "energy", "danceability", "tempo")
+MOOD_NAMES = tuple(MOOD_PRESETS)
+MOOD_INDEX = {name: idx for idx, name in enumerate(MOOD_NAMES)}
+MOOD_VECTORS = np.array(
+    [[MOOD_PRESETS[name][key] for key in FEATURE_KEYS] for name in MOOD_NAMES],
+    dtype=np.float64
+)
+
+# Mood-match scoring: per-feature weights (tempo difference scaled down by 100)
+# and the values assumed when Spotify omits a feature
+FEATURE_WEIGHTS = np.array([2.0, 1.5, 1.5, 0.01], dtype=np.float64)
+FEATURE_DEFAULTS = (0.5, 0.5, 0.5, 120)
+
+# Weights for ranking search results (score_track_match: tempo difference scaled by 1/200)
+SEARCH_FEATURE_WEIGHTS = np.array([2.5, 2.0, 1.5, 1 / 200], dtype=np.float64)
+
+# Client-side cap on Spotify API requests per second, shared by every session in the process
+SPOTIFY_REQUESTS_PER_SECOND = 10
+
+# One generator for the whole process (random picks from the library, chat replies)
+_RNG = np.random.default_rng()
+MOOD_DESCRIPTIONS = tuple(MOOD_PRESETS[name]["description"] for name in MOOD_NAMES)
+MOOD_CARDS = tuple(zip(MOOD_NAMES, MOOD_DESCRIPTIONS))
+
+# Four metric-style tiles for the "Current Audio Features" expander (one element instead of columns + 4 metrics)
+FEATURE_SUMMARY_TEMPLATE = (
+    '<div style="display:flex;gap:1rem">'
+    '<div style="flex:1"><small style="opacity:0.6">Valence</small><div style="font-size:2rem">{valence:.1f}</div></div>'
+    '<div style="flex:1"><small style="opacity:0.6">Energy</small><div style="font-size:2rem">{energy:.1f}</div></div>'
+    '<div style="flex:1"><small style="opacity:0.6">Danceability</small><div style="font-size:2rem">{danceability:.1f}</div></div>'
+    '<div style="flex:1"><small style="opacity:0.6">Tempo</small><div style="font-size:2rem">{tempo} BPM</div></div>'
+    '</div>'
+)
+
+
+# Slim view of a Spotify track with just the fields the track list renders
+TrackCard = namedtuple("TrackCard", "name artists album image_url url preview_url")
+
+# HTML for the track list: one CSS grid, two cells (art, details) per track.
+# No blank lines or indentation: markdown would end the HTML block or turn it into code
+TRACK_LIST_TEMPLATE = (
+    '<div style="display:grid;grid-template-columns:150px 1fr;gap:1.5rem 1rem;align-items:start">'
+    '{cards}'
+    '</div>'
+)
+# Cards near the top are visible on first paint: their art loads eagerly, the rest lazily
+EAGER_IMAGE_COUNT = 3
+TRACK_CARD_TEMPLATE = (
+    '<div>{image}</div>'
+    '<div>'
+    '<h3>{index}. {name}</h3>'
+    '<p><strong>Artist(s):</strong> {artists}</p>'
+    '<p><strong>Album:</strong> {album}</p>'
+    '<p>🔗 <a href="{url}" target="_blank">Open in Spotify</a></p>'
+    '{preview}'
+    '</div>'
+)
+
 
 # Chatbot mood keywords for natural language processing
 CHATBOT_MOOD_KEYWORDS = {
@@ -83,6 +163,13 @@ CHATBOT_MOOD_KEYWORDS = {
     "romantic": ["romantic", "love", "date", "valentine", "couple", "intimate", "sensual"]
 }
 
+# Reverse index: keyword -> preset name, in CHATBOT_MOOD_KEYWORDS order
+KEYWORD_TO_MOOD = {
+    keyword: mood.capitalize()
+    for mood, keywords in CHATBOT_MOOD_KEYWORDS.items()
+    for keyword in keywords
+}
+
 # Activity to mood mapping
 ACTIVITY_MOOD_MAP = {
     "workout": "Hype",
@@ -103,45 +190,217 @@ ACTIVITY_MOOD_MAP = {
     "dinner": "Romantic",
 }
 
+# Phrases asking for more / less energy when no mood keyword matched
+ENERGY_UP_PHRASES = ("more energy", "energetic", "faster", "upbeat")
+ENERGY_DOWN_PHRASES = ("slower", "calmer", "quieter", "softer")
+
+# Every literal the keyword parser looks for
+PARSER_KEYWORDS = frozenset((*ACTIVITY_MOOD_MAP, *KEYWORD_TO_MOOD, *ENERGY_UP_PHRASES, *ENERGY_DOWN_PHRASES))
+
+# Phrases that introduce an artist name, checked in this order
+ARTIST_PATTERNS = (
+    "songs by ",
+    "music by ",
+    "tracks by ",
+    "artist ",
+    "listen to ",
+    "play ",
+    "from ",
+    "show me ",
+    "find ",
+    "get me ",
+    "give me ",
+)
+
+# Words that end an artist name
+ARTIST_STOP_WORDS = frozenset(("songs", "music", "tracks", "please", "that", "are", "is", "by"))
+
+# Chatbot replies per mood; {n} is the number of tracks found
+CHATBOT_RESPONSES = {
+    "Happy": (
+        "🎉 Found {n} upbeat tracks to boost your mood!",
+        "☀️ Here are {n} cheerful songs from your library!",
+        "😊 {n} happy vibes coming right up!"
+    ),
+    "Chill": (
+        "😌 Found {n} relaxing tracks for you",
+        "🌙 Here are {n} chill songs to help you unwind",
+        "☁️ {n} mellow tracks from your collection"
+    ),
+    "Focus": (
+        "🎯 Found {n} tracks to boost your concentration",
+        "📚 Here are {n} focus-enhancing songs",
+        "💡 {n} productivity tracks ready!"
+    ),
+    "Sad": (
+        "💙 Found {n} songs that match your mood",
+        "🌧️ Here are {n} emotional tracks",
+        "🎭 {n} songs to help you process those feelings"
+    ),
+    "Hype": (
+        "🔥 Found {n} high-energy bangers!",
+        "⚡ Here are {n} tracks to get you pumped!",
+        "💪 {n} intense songs to fuel your energy!"
+    ),
+    "Romantic": (
+        "❤️ Found {n} romantic tracks for you",
+        "💕 Here are {n} love songs from your library",
+        "🌹 {n} beautiful tracks for your special moment"
+    )
+}
+
+# Genre seeds that match each mood
+MOOD_GENRES = {
+    "Happy": ("pop", "dance", "party", "funk", "disco"),
+    "Chill": ("ambient", "chill", "indie", "acoustic", "lo-fi"),
+    "Focus": ("ambient", "classical", "piano", "study", "minimal-techno"),
+    "Sad": ("acoustic", "singer-songwriter", "indie", "sad", "emo"),
+    "Hype": ("edm", "hip-hop", "rock", "hardstyle", "dubstep"),
+    "Romantic": ("romance", "r-n-b", "soul", "indie-pop", "pop")
+}
+DEFAULT_GENRES = ("pop", "indie")
+
+# Search keywords used to find candidate tracks for each mood
+MOOD_SEARCH_KEYWORDS = {
+    "Happy": "happy upbeat cheerful positive",
+    "Chill": "chill relaxed mellow ambient",
+    "Focus": "focus study concentration ambient",
+    "Sad": "sad melancholy emotional ballad",
+    "Hype": "hype energetic pump party workout",
+    "Romantic": "romantic love beautiful emotional"
+}
+
+# Spotify's genre seed list (hardcoded since the API endpoint may have issues)
+AVAILABLE_GENRES = frozenset((
+    "acoustic", "afrobeat", "alt-rock", "alternative", "ambient", "anime",
+    "black-metal", "bluegrass", "blues", "bossanova", "brazil", "breakbeat",
+    "british", "cantopop", "chicago-house", "children", "chill", "classical",
+    "club", "comedy", "country", "dance", "dancehall", "death-metal", "deep-house",
+    "detroit-techno", "disco", "disney", "drum-and-bass", "dub", "dubstep",
+    "edm", "electro", "electronic", "emo", "folk", "forro", "french", "funk",
+    "garage", "german", "gospel", "goth", "grindcore", "groove", "grunge",
+    "guitar", "happy", "hard-rock", "hardcore", "hardstyle", "heavy-metal",
+    "hip-hop", "holidays", "honky-tonk", "house", "idm", "indian", "indie",
+    "indie-pop", "industrial", "iranian", "j-dance", "j-idol", "j-pop", "j-rock",
+    "jazz", "k-pop", "kids", "latin", "latino", "malay", "mandopop", "metal",
+    "metal-misc", "metalcore", "minimal-techno", "movies", "mpb", "new-age",
+    "new-release", "opera", "pagode", "party", "philippines-opm", "piano",
+    "pop", "pop-film", "post-dubstep", "power-pop", "progressive-house",
+    "psych-rock", "punk", "punk-rock", "r-n-b", "rainy-day", "reggae",
+    "reggaeton", "road-trip", "rock", "rock-n-roll", "rockabilly", "romance",
+    "sad", "salsa", "samba", "sertanejo", "show-tunes", "singer-songwriter",
+    "ska", "sleep", "songwriter", "soul", "soundtracks", "spanish", "study",
+    "summer", "swedish", "synth-pop", "tango", "techno", "trance", "trip-hop",
+    "turkish", "work-out", "world-music"
+))
+
+# Common spellings of genres; an exact genre name always wins over an alias
+GENRE_ALIASES = {
+    "indie": "indie-pop",
+    "rnb": "r-n-b",
+    "r&b": "r-n-b",
+    "r-and-b": "r-n-b",
+    "hiphop": "hip-hop",
+    "hip hop": "hip-hop"
+}
+GENRE_CANONICAL = {
+    **{alias: genre for alias, genre in GENRE_ALIASES.items() if genre in AVAILABLE_GENRES},
+    **{genre: genre for genre in AVAILABLE_GENRES}
+}
+
 
 def parse_mood_from_text(user_input):
     """
     Extract mood and preferences from natural language input.
     Returns: (mood_name, mood_features, explanation)
     """
-    user_input_lower = user_input.lower()
+    # Case and spacing don't change the result, so normalize before the cache lookup
+    mood_name, explanation = _parse_mood_keywords(" ".join(user_input.lower().split()))
+    return mood_name, MOOD_PRESETS[mood_name].copy(), explanation
+
+
+@st.cache_resource
+def get_keyword_automaton():
+    """
+    Aho-Corasick automaton over every parser keyword (finds all of them, overlapping
+    ones included, in one scan). None when pyahocorasick isn't installed.
+    """
+    try:
+        import ahocorasick
+    except ImportError:
+        return None
+    
+    automaton = ahocorasick.Automaton()
+    for keyword in PARSER_KEYWORDS:
+        automaton.add_word(keyword, keyword)
+    automaton.make_automaton()
+    return automaton
+
+
+@st.cache_resource
+def get_artist_pattern_automaton():
+    """Aho-Corasick automaton over ARTIST_PATTERNS. None when pyahocorasick isn't installed."""
+    try:
+        import ahocorasick
+    except ImportError:
+        return None
+    
+    automaton = ahocorasick.Automaton()
+    for pattern in ARTIST_PATTERNS:
+        automaton.add_word(pattern, pattern)
+    automaton.make_automaton()
+    return automaton
+
+
+def _find_artist_patterns(user_input_lower):
+    """Start index of the first occurrence of each ARTIST_PATTERNS entry in the text"""
+    automaton = get_artist_pattern_automaton()
+    if automaton is None:
+        positions = {pattern: user_input_lower.find(pattern) for pattern in ARTIST_PATTERNS}
+        return {pattern: idx for pattern, idx in positions.items() if idx != -1}
+    
+    positions = {}
+    for end_idx, pattern in automaton.iter(user_input_lower):
+        # Matches arrive in end order, so the first hit per pattern is its leftmost one
+        positions.setdefault(pattern, end_idx - len(pattern) + 1)
+    return positions
+
+
+def _find_keywords(user_input_lower):
+    """Set of PARSER_KEYWORDS that occur anywhere in the text (plain substring semantics)"""
+    automaton = get_keyword_automaton()
+    if automaton is None:
+        return {keyword for keyword in PARSER_KEYWORDS if keyword in user_input_lower}
+    return {keyword for _, keyword in automaton.iter(user_input_lower)}
+
+
+@st.cache_data(max_entries=512, show_spinner=False)
+def _parse_mood_keywords(user_input_lower):
+    """Keyword-based mood detection on normalized text, cached so repeated prompts skip the scan"""
+    found = _find_keywords(user_input_lower)
     
     # Check for activity keywords first
     for activity, mood in ACTIVITY_MOOD_MAP.items():
-        if activity in user_input_lower:
-            features = MOOD_PRESETS[mood].copy()
-            return mood, features, f"Perfect for {activity}! Setting mood to {mood}."
+        if activity in found:
+            return mood, f"Perfect for {activity}! Setting mood to {mood}."
     
-    # Check for direct mood keywords
-    mood_scores = {}
-    for mood_name, keywords in CHATBOT_MOOD_KEYWORDS.items():
-        score = sum(1 for keyword in keywords if keyword in user_input_lower)
-        if score > 0:
-            mood_scores[mood_name] = score
+    # Check for direct mood keywords (ties go to the earlier mood)
+    mood_scores = Counter(mood for keyword, mood in KEYWORD_TO_MOOD.items() if keyword in found)
     
     if mood_scores:
         # Get the mood with highest keyword match
-        best_mood = max(mood_scores, key=mood_scores.get)
-        mood_name = best_mood.capitalize()
-        features = MOOD_PRESETS[mood_name].copy()
-        return mood_name, features, f"Detected {mood_name} mood from your request!"
+        mood_name = mood_scores.most_common(1)[0][0]
+        return mood_name, f"Detected {mood_name} mood from your request!"
     
     # Check for energy level adjustments
-    if any(word in user_input_lower for word in ["more energy", "energetic", "faster", "upbeat"]):
-        features = MOOD_PRESETS["Hype"].copy()
-        return "Hype", features, "You want high energy! Setting to Hype mode."
+    if not found.isdisjoint(ENERGY_UP_PHRASES):
+        return "Hype", "You want high energy! Setting to Hype mode."
     
-    if any(word in user_input_lower for word in ["slower", "calmer", "quieter", "softer"]):
-        features = MOOD_PRESETS["Chill"].copy()
-        return "Chill", features, "You want something calmer! Setting to Chill mode."
+    if not found.isdisjoint(ENERGY_DOWN_PHRASES):
+        return "Chill", "You want something calmer! Setting to Chill mode."
     
     # Default to Happy if no clear mood detected
-    return "Happy", MOOD_PRESETS["Happy"].copy(), "No specific mood detected, showing upbeat tracks!"
+    return "Happy", "No specific mood detected, showing upbeat tracks!"
 
 
 def parse_with_gpt(user_input):
@@ -168,7 +427,7 @@ Examples:
 - "play happy taylor swift songs" -> {"mood": "Happy", "artist": "Taylor Swift", "explanation": "User wants happy songs by Taylor Swift"}
 """
 
-        response = openai_client.chat.completions.create(
+        response = get_openai_client().chat.completions.create(
             model=model,
             messages=[
                 {"role": "system", "content": system_prompt},
@@ -202,38 +461,20 @@ def extract_artist_from_text(user_input):
     Try to extract artist name from user input.
     Returns artist name if found, None otherwise.
     """
-    user_input_lower = user_input.lower()
-    
-    # Common patterns for artist requests
-    patterns = [
-        "songs by ",
-        "music by ",
-        "tracks by ",
-        "artist ",
-        "listen to ",
-        "play ",
-        "from ",
-        "show me ",
-        "find ",
-        "get me ",
-        "give me ",
-    ]
-    
-    for pattern in patterns:
-        if pattern in user_input_lower:
+    positions = _find_artist_patterns(user_input.lower())
+    
+    for pattern in ARTIST_PATTERNS:
+        start_idx = positions.get(pattern, -1)
+        if start_idx != -1:
             # Extract text after the pattern
-            start_idx = user_input_lower.index(pattern) + len(pattern)
-            remaining = user_input[start_idx:].strip()
-            
-            # Stop at common keywords that indicate end of artist name
-            stop_words = ["songs", "music", "tracks", "please", "that", "are", "is", "by"]
+            remaining = user_input[start_idx + len(pattern):].strip()
             
-            # Handle multi-word artist names (take up to 4 words or until stop word)
-            words = remaining.split()
+            # Handle multi-word artist names (take up to 4 words or until stop word);
+            # maxsplit stops tokenizing once the 4 candidate words are found
             artist_words = []
             
-            for word in words[:4]:  # Max 4 words for artist name
-                if word.lower() in stop_words:
+            for word in remaining.split(None, 4)[:4]:  # Max 4 words for artist name
+                if word.lower() in ARTIST_STOP_WORDS:
                     break
                 artist_words.append(word)
             
@@ -245,50 +486,109 @@ def extract_artist_from_text(user_input):
 
 def generate_chatbot_response(user_input, tracks, mood_name):
     """Generate a friendly chatbot response with track recommendations"""
-    responses = {
-        "Happy": [
-            f"🎉 Found {len(tracks)} upbeat tracks to boost your mood!",
-            f"☀️ Here are {len(tracks)} cheerful songs from your library!",
-            f"😊 {len(tracks)} happy vibes coming right up!"
-        ],
-        "Chill": [
-            f"😌 Found {len(tracks)} relaxing tracks for you",
-            f"🌙 Here are {len(tracks)} chill songs to help you unwind",
-            f"☁️ {len(tracks)} mellow tracks from your collection"
-        ],
-        "Focus": [
-            f"🎯 Found {len(tracks)} tracks to boost your concentration",
-            f"📚 Here are {len(tracks)} focus-enhancing songs",
-            f"💡 {len(tracks)} productivity tracks ready!"
-        ],
-        "Sad": [
-            f"💙 Found {len(tracks)} songs that match your mood",
-            f"🌧️ Here are {len(tracks)} emotional tracks",
-            f"🎭 {len(tracks)} songs to help you process those feelings"
-        ],
-        "Hype": [
-            f"🔥 Found {len(tracks)} high-energy bangers!",
-            f"⚡ Here are {len(tracks)} tracks to get you pumped!",
-            f"💪 {len(tracks)} intense songs to fuel your energy!"
-        ],
-        "Romantic": [
-            f"❤️ Found {len(tracks)} romantic tracks for you",
-            f"💕 Here are {len(tracks)} love songs from your library",
-            f"🌹 {len(tracks)} beautiful tracks for your special moment"
-        ]
-    }
+    templates = CHATBOT_RESPONSES.get(mood_name, ("Found {n} tracks for you!",))
+    # Pick the reply first so only one template is formatted
+    return templates[_RNG.integers(len(templates))].format(n=len(tracks))
+
+
+class RequestRateLimiter:
+    """Sliding-window limiter: at most `rate` requests start in any `per`-second window (thread-safe)"""
+    
+    def __init__(self, rate, per=1.0):
+        self._starts = deque(maxlen=rate)
+        self._per = per
+        self._lock = threading.Lock()
+    
+    def acquire(self):
+        """Block until another request may start"""
+        with self._lock:
+            now = time.monotonic()
+            if len(self._starts) == self._starts.maxlen:
+                # The oldest start must leave the window before this one is allowed
+                wait = self._per - (now - self._starts[0])
+                if wait > 0:
+                    time.sleep(wait)
+                    now = time.monotonic()
+            self._starts.append(now)
+
+
+def _spotify_credentials():
+    """Resolve the Spotify client ID and secret from the environment"""
+    return os.getenv("SPOTIPY_CLIENT_ID"), os.getenv("SPOTIPY_CLIENT_SECRET")
+
+
+@st.cache_resource
+def get_http_session():
+    """Create a pooled HTTP session shared by every Spotify client in this server process"""
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+    
+    session = requests.Session()
+    
+    # Same retry policy spotipy builds by default, so 429/5xx handling is unchanged
+    retry = Retry(
+        total=3,
+        connect=None,
+        read=False,
+        allowed_methods=frozenset(["GET", "POST", "PUT", "DELETE"]),
+        status=3,
+        backoff_factor=0.3,
+        status_forcelist=[429, 500, 502, 503, 504]
+    )
+    
+    # Every sp.* call goes through this adapter, so one limiter smooths bursts from
+    # concurrent searches and reruns before Spotify answers them with 429s
+    limiter = RequestRateLimiter(SPOTIFY_REQUESTS_PER_SECOND)
+    
+    class RateLimitedAdapter(HTTPAdapter):
+        def send(self, request, **kwargs):
+            limiter.acquire()
+            return super().send(request, **kwargs)
+    
+    # Keep-alive connections to api.spotify.com / accounts.spotify.com are reused across reruns
+    adapter = RateLimitedAdapter(pool_connections=4, pool_maxsize=16, max_retries=retry)
+    session.mount("https://", adapter)
+    
+    # Parse JSON bodies with orjson when it's installed (spotipy only calls response.json())
+    try:
+        import orjson
+    except ImportError:
+        orjson = None
+    
+    if orjson is not None:
+        def _orjson_response(response, *args, **kwargs):
+            response.json = lambda **_: orjson.loads(response.content)
+            return response
+        
+        session.hooks["response"].append(_orjson_response)
     
-    import random
-    return random.choice(responses.get(mood_name, [f"Found {len(tracks)} tracks for you!"]))
+    return session
 
 
 @st.cache_resource
+def get_openai_client():
+    """Create the OpenAI client on first chatbot use (openai is only imported then)"""
+    from openai import OpenAI
+    return OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+
+@st.cache_resource
+def get_io_pool():
+    """Thread pool for independent Spotify requests (worker threads must not call st.*)"""
+    return ThreadPoolExecutor(max_workers=8)
+
+
+@st.cache_resource(show_spinner=False)
 def get_spotify_client():
     """Initialize and cache Spotify client with OAuth support"""
+    # Imported lazily so the page header renders before spotipy is loaded
+    import spotipy
+    from spotipy.oauth2 import SpotifyOAuth
+    
     try:
-        client_id = os.getenv("SPOTIPY_CLIENT_ID")
-        client_secret = os.getenv("SPOTIPY_CLIENT_SECRET")
-        redirect_uri = os.getenv("SPOTIPY_REDIRECT_URI")
+        client_id, client_secret = _spotify_credentials()
+        redirect_uri = SPOTIPY_REDIRECT_URI
         
         if not client_id or not client_secret:
             st.error("⚠️ Spotify credentials not found!")
@@ -313,87 +613,185 @@ def get_spotify_client():
             scope="user-library-read user-top-read playlist-modify-private",
             cache_path=".cache_streamlit",
             show_dialog=True,
-            open_browser=False  # Don't try to open browser in Streamlit Cloud
+            open_browser=False,  # Don't try to open browser in Streamlit Cloud
+            requests_session=get_http_session()
         )
         
-        sp = spotipy.Spotify(auth_manager=auth_manager)
+        sp = spotipy.Spotify(auth_manager=auth_manager, requests_session=get_http_session())
         return sp, auth_manager
     except Exception as e:
         st.error(f"Error initializing Spotify client: {e}")
         st.stop()
 
 
-def get_spotify_client_credentials_only():
-    """Fallback: Initialize Spotify client with Client Credentials (no user auth)"""
+@st.cache_resource(show_spinner=False)
+def get_spotify_client_credentials_only(client_id, client_secret):
+    """
+    Fallback: Initialize Spotify client with Client Credentials (no user auth).
+    One client per credential pair is shared across reruns and sessions, so its
+    token is negotiated once and rotated credentials get a fresh client.
+    """
+    import spotipy
+    from spotipy.oauth2 import SpotifyClientCredentials
+    
     try:
-        client_id = os.getenv("SPOTIPY_CLIENT_ID")
-        client_secret = os.getenv("SPOTIPY_CLIENT_SECRET")
-        
         if not client_id or not client_secret:
             st.error("⚠️ Spotify credentials not found!")
             st.stop()
         
         client_credentials_manager = SpotifyClientCredentials(
             client_id=client_id,
-            client_secret=client_secret
+            client_secret=client_secret,
+            requests_session=get_http_session()
+        )
+        sp = spotipy.Spotify(
+            client_credentials_manager=client_credentials_manager,
+            requests_session=get_http_session()
         )
-        sp = spotipy.Spotify(client_credentials_manager=client_credentials_manager)
         return sp
     except Exception as e:
         st.error(f"Error initializing Spotify client: {e}")
         st.stop()
 
 
-def get_user_liked_track_ids(sp, max_ids=300):
-    """Get up to 300 of the user's saved (Liked) tracks with strict validation"""
+def _fetch_liked_tracks(sp, max_ids):
+    """Page through the user's saved tracks into an ordered {id: track} map (errors propagate)"""
+    tracks = {}
+    first_page = sp.current_user_saved_tracks(limit=50)
+    
+    # The first page tells us the library size, so the remaining pages up to
+    # max_ids can be requested by offset all at once instead of via sp.next()
+    offsets = range(50, min(first_page.get("total", 0), max_ids), 50)
+    pages = [first_page] + list(get_io_pool().map(
+        lambda offset: sp.current_user_saved_tracks(limit=50, offset=offset),
+        offsets
+    ))
+    
+    # Validate page by page and stop once we have enough IDs
+    while True:
+        for results in pages:
+            for it in results.get("items", []):
+                t = it.get("track")
+                # Keep only real Spotify track IDs
+                if not t or t.get("type") != "track" or t.get("is_local"):
+                    continue
+                tid = t.get("id")
+                if tid:
+                    tracks[tid] = t
+                    if len(tracks) >= max_ids:
+                        return tracks
+        
+        # Local/unavailable items left us short: keep paging sequentially
+        if not pages[-1].get("next"):
+            return tracks
+        pages = [sp.next(pages[-1])]
+
+
+@st.cache_data(ttl=3600, max_entries=32, show_spinner=False)
+def _cached_liked_tracks(_sp, user_id, total, latest_added_at, max_ids):
+    """
+    Liked-songs map cached per user for an hour. Saving or removing a song changes
+    the library size or its newest entry, so a changed library gets a new key.
+    The Spotify client is excluded from the cache key (leading underscore).
+    """
+    return _fetch_liked_tracks(_sp, max_ids)
+
+
+def get_user_liked_tracks(sp, max_ids=300, user_id=None):
+    """Get up to 300 of the user's saved (Liked) tracks with strict validation, as an ordered {id: track} map"""
     try:
-        items = []
-        results = sp.current_user_saved_tracks(limit=50)
-        items += results.get("items", [])
-        
-        while results.get("next") and len(items) < max_ids:
-            results = sp.next(results)
-            items += results.get("items", [])
-        
-        # Keep only real Spotify track IDs with strict validation
-        ids = []
-        for it in items:
-            t = it.get("track")
-            if not t: 
-                continue
-            if t.get("type") != "track":
-                continue
-            if t.get("is_local"):
-                continue
-            tid = t.get("id")
-            if tid:
-                ids.append(tid)
+        if not user_id:
+            return _fetch_liked_tracks(sp, max_ids)
         
-        return ids
+        # One single-item request tells whether the library changed since it was cached
+        probe = sp.current_user_saved_tracks(limit=1)
+        newest = (probe.get("items") or [{}])[0]
+        return _cached_liked_tracks(sp, user_id, probe.get("total", 0), newest.get("added_at"), max_ids)
     except Exception as e:
         st.warning(f"Could not fetch liked songs: {e}")
-        return []
+        return {}
+
+
+def load_liked_tracks(sp, max_ids=300):
+    """
+    (Re)load the user's liked songs into session state.
+    The full track objects are kept so liked songs can be displayed without
+    another sp.tracks() round-trip; the feature matrix is rebuilt on next use.
+    """
+    profile = st.session_state.get("user_profile") or {}
+    st.session_state.liked_track_map = get_user_liked_tracks(sp, max_ids=max_ids, user_id=profile.get("id"))
+    st.session_state.liked_track_ids = list(st.session_state.liked_track_map)
+    st.session_state.pop("liked_features", None)
+    # Recommendations drawn from the old library must be fetched again
+    st.session_state.pop("manual_results_key", None)
+
+
+def get_tracks_by_id(sp, track_ids):
+    """Full track objects for the given IDs, from the liked-songs map when possible, else sp.tracks()"""
+    known = st.session_state.get("liked_track_map", {})
+    missing = [tid for tid in track_ids if tid not in known]
+    
+    fetched = {}
+    if missing:
+        # Batches requested concurrently, warnings shown from this thread
+        pool = get_io_pool()
+        futures = [pool.submit(sp.tracks, missing[i:i+50]) for i in range(0, len(missing), 50)]
+        for future in futures:
+            try:
+                track_results = future.result()
+                for track in (track_results or {}).get("tracks") or []:
+                    if track:
+                        fetched[track["id"]] = track
+            except Exception as e:
+                st.warning(f"Error fetching track details: {e}")
+    
+    return [known.get(tid) or fetched[tid] for tid in track_ids if tid in known or tid in fetched]
+
+
+def _audio_features_batch(sp, batch, split_on_failure=True):
+    """
+    Fetch audio features for up to 100 IDs as {id: features or None}.
+    If the batch request fails it is retried once as two halves (bounded at 3 requests,
+    rather than one per ID); IDs whose request still failed are left out of the result,
+    so callers can tell "failed" apart from "no features".
+    """
+    try:
+        res = sp.audio_features(batch) or []
+    except Exception:
+        if not split_on_failure or len(batch) == 1:
+            return {}
+        middle = len(batch) // 2
+        resolved = _audio_features_batch(sp, batch[:middle], split_on_failure=False)
+        resolved.update(_audio_features_batch(sp, batch[middle:], split_on_failure=False))
+        return resolved
+    
+    resolved = dict.fromkeys(batch)
+    resolved.update((r["id"], r) for r in res if r)
+    return resolved
+
+
+def get_audio_features_map(sp, track_ids, split_on_failure=True):
+    """
+    Audio features for track_ids as {id: features or None}, in batches of 100 fetched concurrently.
+    Results (including tracks with no features) are kept in st.session_state, so
+    reruns and overlapping searches only hit Spotify for IDs this session hasn't looked up yet.
+    """
+    cache = st.session_state.setdefault("audio_features_cache", {})
+    missing = list(dict.fromkeys(tid for tid in track_ids if tid not in cache))
+    
+    if missing:
+        batches = [missing[i:i+100] for i in range(0, len(missing), 100)]
+        # IDs whose request failed come back absent, so they're retried next time
+        for resolved in get_io_pool().map(lambda batch: _audio_features_batch(sp, batch, split_on_failure), batches):
+            cache.update(resolved)
+    
+    return {tid: cache.get(tid) for tid in track_ids}
 
 
 def safe_audio_features(sp, track_ids):
-    """Safely get audio features with fallback for individual tracks"""
-    feats = []
-    # Chunk to 100 IDs at a time
-    for i in range(0, len(track_ids), 100):
-        batch = track_ids[i:i+100]
-        try:
-            res = sp.audio_features(batch) or []
-            feats.extend([r for r in res if r])
-        except Exception:
-            # Fallback: try each ID individually
-            for tid in batch:
-                try:
-                    r = sp.audio_features([tid])
-                    if r and r[0]:
-                        feats.append(r[0])
-                except Exception:
-                    pass
-    return feats
+    """Safely get audio features, retrying a failed batch as two halves"""
+    features_by_id = get_audio_features_map(sp, track_ids)
+    return [features_by_id[tid] for tid in track_ids if features_by_id[tid]]
 
 
 def get_user_profile(sp):
@@ -436,141 +834,118 @@ def get_top_track_ids(sp, limit=50):
         return []
 
 
-def filter_liked_songs_by_mood(sp, track_ids, mood_features, limit=10):
-    """Filter user's liked songs based on mood features"""
+def clean_feature_row(features):
+    """
+    Normalize one audio-feature dict into a row of floats in FEATURE_KEYS order.
+    
+    Missing dicts, missing keys and explicit None values all fall back to
+    FEATURE_DEFAULTS here, once, so the scoring code can assume a dense matrix.
+    """
+    if not features:
+        return list(FEATURE_DEFAULTS)
+    row = []
+    for key, default in zip(FEATURE_KEYS, FEATURE_DEFAULTS):
+        value = features.get(key)
+        row.append(default if value is None else value)
+    return row
+
+
+def build_feature_matrix(audio_features_list):
+    """Pack audio-feature dicts into (track IDs, (N, 4) float64 matrix) in FEATURE_KEYS order"""
+    present = [features for features in audio_features_list if features and features.get("id")]
+    feature_matrix = np.array(
+        [clean_feature_row(features) for features in present],
+        dtype=np.float64
+    ).reshape(-1, len(FEATURE_KEYS))
+    return [features["id"] for features in present], feature_matrix
+
+
+def get_liked_feature_matrix(sp, liked_track_ids):
+    """
+    Audio-feature matrix for the user's liked songs, built once per session.
+    Cleared whenever liked_track_ids is reloaded, so slider changes only re-score.
+    """
+    if "liked_features" not in st.session_state:
+        st.session_state.liked_features = build_feature_matrix(safe_audio_features(sp, liked_track_ids))
+    return st.session_state.liked_features
+
+
+def mood_distance_scores(feature_matrix, mood_features, weights):
+    """
+    Weighted absolute distance of each feature row from the mood target (lower is better).
+    Computed in place on one scratch array, so only a single (N, 4) temporary is allocated.
+    """
+    target = np.array([mood_features[key] for key in FEATURE_KEYS], dtype=np.float64)
+    diff = np.subtract(feature_matrix, target)
+    np.abs(diff, out=diff)
+    return diff @ weights
+
+
+def rank_track_ids_by_mood(track_ids, feature_matrix, mood_features, limit):
+    """
+    Return the IDs of the `limit` tracks whose audio features best match the mood.
+    Score is the weighted absolute difference per feature (lower is better).
+    """
+    if not track_ids:
+        return []
+    
+    scores = mood_distance_scores(feature_matrix, mood_features, FEATURE_WEIGHTS)
+    
+    # Partial selection of the best `limit`, then order just those (ties keep input order)
+    if limit < len(scores):
+        best = np.argpartition(scores, limit - 1)[:limit]
+    else:
+        best = np.arange(len(scores))
+    best = best[np.lexsort((best, scores[best]))]
+    
+    return [track_ids[i] for i in best]
+
+
+def filter_liked_songs_by_mood(sp, track_ids, feature_matrix, mood_features, limit=10):
+    """Filter user's liked songs based on mood features (see get_liked_feature_matrix)"""
     try:
-        if not track_ids:
-            st.warning("No track IDs provided for filtering.")
-            return []
-        
-        # Get audio features safely with fallback handling
-        audio_features_list = safe_audio_features(sp, track_ids)
-        
         # Guard against empty results
-        if not audio_features_list:
+        if not track_ids:
             st.warning("No usable audio features from your Liked Songs. Showing search-based results instead.")
             return []
         
-        # Score each track based on how well it matches the mood
-        scored_tracks = []
-        for features in audio_features_list:
-            if not features:
-                continue
-            
-            # Calculate similarity score (lower is better)
-            score = 0
-            score += abs(features.get("valence", 0.5) - mood_features["valence"]) * 2
-            score += abs(features.get("energy", 0.5) - mood_features["energy"]) * 1.5
-            score += abs(features.get("danceability", 0.5) - mood_features["danceability"]) * 1.5
-            score += abs(features.get("tempo", 120) - mood_features["tempo"]) / 100
-            
-            scored_tracks.append((features["id"], score))
+        # Score every track against the mood in one vectorized pass
+        best_track_ids = rank_track_ids_by_mood(track_ids, feature_matrix, mood_features, limit)
         
-        if not scored_tracks:
+        if not best_track_ids:
             st.warning("Could not score any tracks. Falling back to search.")
             return []
         
-        # Sort by score (best matches first) and get top tracks
-        scored_tracks.sort(key=lambda x: x[1])
-        best_track_ids = [track_id for track_id, _ in scored_tracks[:limit]]
-        
-        # Get full track details
-        tracks = []
-        for i in range(0, len(best_track_ids), 50):
-            batch = best_track_ids[i:i+50]
-            try:
-                track_results = sp.tracks(batch)
-                if track_results and track_results.get("tracks"):
-                    tracks.extend(track_results["tracks"])
-            except Exception as e:
-                st.warning(f"Error fetching track details: {e}")
-        
-        return tracks[:limit]
+        # Full track details were kept when the liked songs were loaded
+        return get_tracks_by_id(sp, best_track_ids)[:limit]
     
     except Exception as e:
         st.warning(f"Error filtering liked songs: {e}")
         return []
 
 
-@st.cache_data(ttl=3600)
-def get_available_genres(_sp):
-    """Get list of available Spotify genres (cached for 1 hour)"""
-    # Use a hardcoded list of common genres since the API endpoint may have issues
-    return [
-        "acoustic", "afrobeat", "alt-rock", "alternative", "ambient", "anime",
-        "black-metal", "bluegrass", "blues", "bossanova", "brazil", "breakbeat",
-        "british", "cantopop", "chicago-house", "children", "chill", "classical",
-        "club", "comedy", "country", "dance", "dancehall", "death-metal", "deep-house",
-        "detroit-techno", "disco", "disney", "drum-and-bass", "dub", "dubstep",
-        "edm", "electro", "electronic", "emo", "folk", "forro", "french", "funk",
-        "garage", "german", "gospel", "goth", "grindcore", "groove", "grunge",
-        "guitar", "happy", "hard-rock", "hardcore", "hardstyle", "heavy-metal",
-        "hip-hop", "holidays", "honky-tonk", "house", "idm", "indian", "indie",
-        "indie-pop", "industrial", "iranian", "j-dance", "j-idol", "j-pop", "j-rock",
-        "jazz", "k-pop", "kids", "latin", "latino", "malay", "mandopop", "metal",
-        "metal-misc", "metalcore", "minimal-techno", "movies", "mpb", "new-age",
-        "new-release", "opera", "pagode", "party", "philippines-opm", "piano",
-        "pop", "pop-film", "post-dubstep", "power-pop", "progressive-house",
-        "psych-rock", "punk", "punk-rock", "r-n-b", "rainy-day", "reggae",
-        "reggaeton", "road-trip", "rock", "rock-n-roll", "rockabilly", "romance",
-        "sad", "salsa", "samba", "sertanejo", "show-tunes", "singer-songwriter",
-        "ska", "sleep", "songwriter", "soul", "soundtracks", "spanish", "study",
-        "summer", "swedish", "synth-pop", "tango", "techno", "trance", "trip-hop",
-        "turkish", "work-out", "world-music"
-    ]
-
-
-def normalize_genres(user_genres, available_genres):
+def normalize_genres(user_genres):
     """Normalize and validate user-selected genres against Spotify's official list"""
-    # Genre alias mappings for common variations
-    genre_aliases = {
-        "indie": "indie-pop",
-        "rnb": "r-n-b",
-        "r&b": "r-n-b",
-        "r-and-b": "r-n-b",
-        "hiphop": "hip-hop",
-        "hip hop": "hip-hop"
-    }
-    
     validated_genres = []
     for genre in user_genres:
-        genre_lower = genre.lower().strip()
-        
-        # Check if genre exists as-is
-        if genre_lower in available_genres:
-            validated_genres.append(genre_lower)
-        # Check if there's an alias mapping
-        elif genre_lower in genre_aliases and genre_aliases[genre_lower] in available_genres:
-            validated_genres.append(genre_aliases[genre_lower])
+        canonical = GENRE_CANONICAL.get(genre.lower().strip())
+        if canonical:
+            validated_genres.append(canonical)
+            if len(validated_genres) == 5:
+                break
     
     # Return up to 5 valid genres, or default to ["pop"]
-    return validated_genres[:5] if validated_genres else ["pop"]
+    return validated_genres or ["pop"]
 
 
 def get_mood_specific_genres(selected_mood):
     """Get genre seeds that match the selected mood"""
-    mood_genre_map = {
-        "Happy": ["pop", "dance", "party", "funk", "disco"],
-        "Chill": ["ambient", "chill", "indie", "acoustic", "lo-fi"],
-        "Focus": ["ambient", "classical", "piano", "study", "minimal-techno"],
-        "Sad": ["acoustic", "singer-songwriter", "indie", "sad", "emo"],
-        "Hype": ["edm", "hip-hop", "rock", "hardstyle", "dubstep"],
-        "Romantic": ["romance", "r-n-b", "soul", "indie-pop", "pop"]
-    }
-    return mood_genre_map.get(selected_mood, ["pop", "indie"])
+    return MOOD_GENRES.get(selected_mood, DEFAULT_GENRES)
 
 
 def get_mood_search_query(selected_mood, mood_features):
     """Generate a search query based on mood and features"""
-    mood_keywords = {
-        "Happy": "happy upbeat cheerful positive",
-        "Chill": "chill relaxed mellow ambient",
-        "Focus": "focus study concentration ambient",
-        "Sad": "sad melancholy emotional ballad",
-        "Hype": "hype energetic pump party workout",
-        "Romantic": "romantic love beautiful emotional"
-    }
-    return mood_keywords.get(selected_mood, "pop")
+    return MOOD_SEARCH_KEYWORDS.get(selected_mood, "pop")
 
 
 def score_track_match(track_features, target_features):
@@ -616,52 +991,39 @@ def filter_tracks_by_mood(sp, tracks, mood_features, limit=10):
     if not tracks:
         return []
     
-    # Get track IDs
-    track_ids = [track["id"] for track in tracks if track and track.get("id")]
+    # Tracks with an ID are the candidates
+    candidates = [track for track in tracks if track and track.get("id")]
     
-    if not track_ids:
+    if not candidates:
         return []
     
     try:
-        # Get audio features in batches of 100
-        all_features = []
-        for i in range(0, len(track_ids), 100):
-            batch = track_ids[i:i+100]
-            try:
-                features_batch = sp.audio_features(batch)
-                all_features.extend([f for f in features_batch if f])
-            except:
-                # Skip failed batches
-                pass
-        
-        if not all_features:
+        # One batched lookup for all candidates (failed batches are skipped, not split);
+        # features already seen by an earlier search attempt are not fetched again
+        features_by_id = get_audio_features_map(sp, [track["id"] for track in candidates], split_on_failure=False)
+        
+        # Single pass: feature rows for the matrix plus a mask of tracks without features
+        rows = []
+        missing = []
+        for track in candidates:
+            features = features_by_id[track["id"]]
+            missing.append(features is None)
+            rows.append(clean_feature_row(features))
+        
+        if all(missing):
             # If we can't get audio features, return original tracks
             return tracks[:limit]
         
-        # Score each track
-        scored_tracks = []
-        features_by_id = {f["id"]: f for f in all_features if f and f.get("id")}
+        # Score every candidate in one vectorized pass (same formula as score_track_match)
+        scores = mood_distance_scores(np.array(rows, dtype=np.float64), mood_features, SEARCH_FEATURE_WEIGHTS)
         
-        for track in tracks:
-            if not track or not track.get("id"):
-                continue
-            
-            track_id = track["id"]
-            if track_id in features_by_id:
-                features = features_by_id[track_id]
-                score = score_track_match(features, mood_features)
-                scored_tracks.append((track, score))
-            else:
-                # If no features available, give it a high (bad) score but still include it
-                scored_tracks.append((track, 10.0))
+        # If no features available, give it a high (bad) score but still include it
+        scores[missing] = 10.0
         
-        if not scored_tracks:
-            return tracks[:limit]
-        
-        # Sort by score (lower is better) and return top matches
+        # Sort by score (lower is better, ties keep search order) and return top matches
         # Always return 'limit' tracks even if scores are high
-        scored_tracks.sort(key=lambda x: x[1])
-        return [track for track, score in scored_tracks[:limit]]
+        order = np.argsort(scores, kind="stable")[:limit]
+        return [candidates[i] for i in order]
         
     except Exception as e:
         # If anything fails, return original tracks
@@ -669,57 +1031,168 @@ def filter_tracks_by_mood(sp, tracks, mood_features, limit=10):
         return tracks[:limit]
 
 
+def _search_recommendations(sp, mood_features, selected_mood, limit):
+    """Search Spotify for mood-matching tracks, broadening the query until enough are found"""
+    # Build search query based on mood
+    search_query = get_mood_search_query(selected_mood, mood_features)
+    
+    # Determine year range based on energy (higher energy = more recent)
+    # Make year range broader to increase results
+    if mood_features["energy"] > 0.7:
+        year_filter = " year:2018-2025"
+    elif mood_features["energy"] > 0.4:
+        year_filter = " year:2010-2025"
+    else:
+        year_filter = " year:2000-2025"
+    
+    tracks = []
+    pool = get_io_pool()
+    
+    # Attempt 1 (mood query + year filter) and attempt 2 (mood query alone) are
+    # probed together: attempt 2 is the usual fallback and attempt 5 reuses it,
+    # so a short first result no longer costs an extra round-trip
+    primary_future = pool.submit(
+        sp.search,
+        q=search_query + year_filter,
+        limit=50,  # Spotify max is 50 per request
+        type='track',
+        market='US'
+    )
+    broad_future = pool.submit(sp.search, q=search_query, limit=50, type='track', market='US')
+    
+    # Attempt 1: Search with mood query and year filter
+    try:
+        results = primary_future.result()
+        raw_tracks = results.get('tracks', {}).get('items', [])
+        
+        # For difficult moods like Sad, search multiple times to get more candidates
+        if selected_mood in ["Sad", "Focus", "Chill"] and len(raw_tracks) < 50:
+            # Try additional searches with different keywords
+            additional_queries = {
+                "Sad": ["melancholic", "heartbreak", "lonely", "blue"],
+                "Focus": ["instrumental", "concentration", "lofi"],
+                "Chill": ["relaxing", "calm", "peaceful"]
+            }
+            # The extra searches are independent, so issue them concurrently
+            futures = [
+                pool.submit(
+                    sp.search,
+                    q=extra_term + year_filter,
+                    limit=25,
+                    type='track',
+                    market='US'
+                )
+                for extra_term in additional_queries.get(selected_mood, [])[:2]
+            ]
+            for future in futures:
+                try:
+                    extra_results = future.result()
+                    raw_tracks.extend(extra_results.get('tracks', {}).get('items', []))
+                except:
+                    pass
+        
+        if raw_tracks:
+            # Filter by audio features to ensure mood match
+            tracks = filter_tracks_by_mood(sp, raw_tracks, mood_features, limit)
+    except Exception as e:
+        st.warning(f"Initial search failed: {e}")
+    
+    # Attempts 2-4: broader queries, tried in order until we have enough tracks.
+    # Attempt 2 is already in flight; 3 and 4 don't depend on each other, so both
+    # are requested together and the cascade only waits on whichever it reaches.
+    if len(tracks) < limit:
+        # Use first mood-specific genre (only needed for attempt 4)
+        seed_genres = normalize_genres(get_mood_specific_genres(selected_mood))
+        genre_query = f"genre:{seed_genres[0]}" if seed_genres else "pop"
+        fallback_searches = [
+            ("🔄 Expanding search criteria...", search_query, "Broader search failed"),
+            ("🔄 Using broader mood search...", selected_mood.lower(), "Generic search failed"),
+            ("🔄 Trying genre-based search...", f"{genre_query} {search_query}", "Genre search failed")
+        ]
+        futures = [broad_future] + [
+            pool.submit(sp.search, q=query, limit=50, type='track', market='US')
+            for _, query, _ in fallback_searches[1:]
+        ]
+        
+        for (message, _, failure), future in zip(fallback_searches, futures):
+            if len(tracks) >= limit:
+                break
+            st.info(message)
+            try:
+                raw_tracks = future.result().get('tracks', {}).get('items', [])
+                if raw_tracks:
+                    additional_tracks = filter_tracks_by_mood(sp, raw_tracks, mood_features, limit)
+                    # Add tracks we don't already have
+                    existing_ids = {t['id'] for t in tracks}
+                    for track in additional_tracks:
+                        if track['id'] not in existing_ids:
+                            tracks.append(track)
+                            if len(tracks) >= limit:
+                                break
+            except Exception as e:
+                st.warning(f"{failure}: {e}")
+    
+    # Attempt 5: Absolute last resort - return whatever we found, no filtering.
+    # This is the attempt-2 query, so its (unfiltered) top results are reused.
+    if len(tracks) < limit:
+        st.info("🔄 Finding popular tracks as fallback...")
+        try:
+            results = broad_future.result()
+            raw_tracks = results.get('tracks', {}).get('items', [])
+            if raw_tracks:
+                st.warning("⚠️ Showing unfiltered results (audio feature validation unavailable).")
+                tracks = raw_tracks[:limit]
+        except Exception as e:
+            st.error(f"All search attempts failed: {e}")
+    
+    if not tracks:
+        # Raised rather than returned so st.cache_data never stores an empty result
+        raise LookupError("No tracks found for the current mood settings")
+    
+    return tracks
+
+
+@st.cache_data(ttl=3600, max_entries=256, show_spinner=False)
+def _cached_search_recommendations(_sp, valence, energy, danceability, tempo, selected_mood, limit):
+    """
+    Cache search-based recommendations keyed on the feature values.
+    The Spotify client is excluded from the cache key (leading underscore).
+    Raises LookupError when every search attempt comes back empty.
+    """
+    mood_features = {
+        "valence": valence,
+        "energy": energy,
+        "danceability": danceability,
+        "tempo": tempo
+    }
+    return _search_recommendations(_sp, mood_features, selected_mood, limit)
+
+
+@st.cache_data(ttl=600, max_entries=256, show_spinner=False)
+def _cached_artist_search(_sp, artist_name, limit):
+    """
+    Cache an artist's top search results (public catalog data, so shared by every session).
+    The Spotify client is excluded from the cache key (leading underscore).
+    """
+    results = _sp.search(q=f"artist:{artist_name}", limit=limit, type='track', market='US')
+    return results.get('tracks', {}).get('items', [])
+
+
 def get_recommendations(sp, mood_features, selected_mood="Happy", limit=10, use_liked_songs=False, liked_track_ids=None):
     """Get track recommendations using liked songs with improved seed selection"""
+    from spotipy.exceptions import SpotifyException
+    
     try:
         # If user is logged in and has liked songs, show them songs FROM their library!
         if use_liked_songs and liked_track_ids and len(liked_track_ids) >= limit:
-            import random
-            
             st.info(f"🎵 Analyzing your {len(liked_track_ids)} liked songs to match {selected_mood} mood...")
             
-            # Try to get audio features and filter by mood
+            # Score the whole library against the mood using the session's feature matrix
             try:
-                # Get a larger sample to filter from
-                sample_size = min(100, len(liked_track_ids))
-                sample_ids = random.sample(liked_track_ids, sample_size)
+                feature_ids, feature_matrix = get_liked_feature_matrix(sp, liked_track_ids)
                 
-                # Get audio features in batches
-                audio_features_list = []
-                for i in range(0, len(sample_ids), 100):
-                    batch = sample_ids[i:i+100]
-                    try:
-                        features_batch = sp.audio_features(batch)
-                        audio_features_list.extend([f for f in features_batch if f])
-                    except:
-                        # If audio features fail, skip this batch
-                        pass
-                
-                if len(audio_features_list) >= limit:
-                    # Score each track based on mood match
-                    scored_tracks = []
-                    for features in audio_features_list:
-                        if not features or not features.get("id"):
-                            continue
-                        
-                        # Calculate similarity score (lower is better)
-                        score = 0
-                        score += abs(features.get("valence", 0.5) - mood_features["valence"]) * 2
-                        score += abs(features.get("energy", 0.5) - mood_features["energy"]) * 1.5
-                        score += abs(features.get("danceability", 0.5) - mood_features["danceability"]) * 1.2
-                        
-                        scored_tracks.append((features["id"], score))
-                    
-                    # Sort by score and get the best matches
-                    scored_tracks.sort(key=lambda x: x[1])
-                    best_track_ids = [track_id for track_id, score in scored_tracks[:limit]]
-                    
-                    # Get full track details
-                    tracks = []
-                    for i in range(0, len(best_track_ids), 50):
-                        batch = best_track_ids[i:i+50]
-                        results = sp.tracks(batch)
-                        tracks.extend(results.get("tracks", []))
+                if len(feature_ids) >= limit:
+                    tracks = filter_liked_songs_by_mood(sp, feature_ids, feature_matrix, mood_features, limit)
                     
                     if tracks:
                         st.success(f"✅ Found {len(tracks)} songs from YOUR library that match {selected_mood} mood!")
@@ -730,15 +1203,11 @@ def get_recommendations(sp, mood_features, selected_mood="Happy", limit=10, use_
                 st.info(f"Could not analyze mood features, showing random picks from your library...")
             
             # Fallback: just show random songs from their library
-            selected_ids = random.sample(liked_track_ids, min(limit, len(liked_track_ids)))
+            selected_ids = _RNG.choice(liked_track_ids, size=min(limit, len(liked_track_ids)), replace=False).tolist()
             
             # Get track details
             try:
-                tracks = []
-                for i in range(0, len(selected_ids), 50):
-                    batch = selected_ids[i:i+50]
-                    results = sp.tracks(batch)
-                    tracks.extend(results.get("tracks", []))
+                tracks = get_tracks_by_id(sp, selected_ids)
                 
                 if tracks:
                     st.success(f"✅ Found {len(tracks)} random songs from YOUR liked songs!")
@@ -746,154 +1215,19 @@ def get_recommendations(sp, mood_features, selected_mood="Happy", limit=10, use_
             except Exception as e:
                 st.warning(f"Could not fetch track details: {e}")
         
-        # Fallback to search-based approach
-        # Get official Spotify genre list
-        available_genres = get_available_genres(sp)
-        
-        # Use mood-specific genre seeds for better matching
-        mood_genres = get_mood_specific_genres(selected_mood)
-        seed_genres = normalize_genres(mood_genres, available_genres)
-        
-        # Build search query based on mood
-        search_query = get_mood_search_query(selected_mood, mood_features)
-        
-        # Determine year range based on energy (higher energy = more recent)
-        # Make year range broader to increase results
-        if mood_features["energy"] > 0.7:
-            year_filter = " year:2018-2025"
-        elif mood_features["energy"] > 0.4:
-            year_filter = " year:2010-2025"
-        else:
-            year_filter = " year:2000-2025"
-        
-        tracks = []
-        
-        # Attempt 1: Search with mood query and year filter
+        # Fallback to search-based approach (cached on the slider values)
         try:
-            results = sp.search(
-                q=search_query + year_filter,
-                limit=50,  # Spotify max is 50 per request
-                type='track',
-                market='US'
+            # Rounded so float noise from the sliders / chat presets can't split cache entries
+            tracks = _cached_search_recommendations(
+                sp,
+                round(mood_features["valence"], 2),
+                round(mood_features["energy"], 2),
+                round(mood_features["danceability"], 2),
+                int(mood_features["tempo"]),
+                selected_mood,
+                limit
             )
-            raw_tracks = results.get('tracks', {}).get('items', [])
-            
-            # For difficult moods like Sad, search multiple times to get more candidates
-            if selected_mood in ["Sad", "Focus", "Chill"] and len(raw_tracks) < 50:
-                # Try additional searches with different keywords
-                additional_queries = {
-                    "Sad": ["melancholic", "heartbreak", "lonely", "blue"],
-                    "Focus": ["instrumental", "concentration", "lofi"],
-                    "Chill": ["relaxing", "calm", "peaceful"]
-                }
-                for extra_term in additional_queries.get(selected_mood, [])[:2]:
-                    try:
-                        extra_results = sp.search(
-                            q=extra_term + year_filter,
-                            limit=25,
-                            type='track',
-                            market='US'
-                        )
-                        raw_tracks.extend(extra_results.get('tracks', {}).get('items', []))
-                    except:
-                        pass
-            
-            if raw_tracks:
-                # Filter by audio features to ensure mood match
-                tracks = filter_tracks_by_mood(sp, raw_tracks, mood_features, limit)
-        except Exception as e:
-            st.warning(f"Initial search failed: {e}")
-        
-        # Attempt 2: If we have fewer than requested, try without year filter (broader search)
-        if len(tracks) < limit:
-            st.info("🔄 Expanding search criteria...")
-            try:
-                results = sp.search(
-                    q=search_query,
-                    limit=50,
-                    type='track',
-                    market='US'
-                )
-                raw_tracks = results.get('tracks', {}).get('items', [])
-                if raw_tracks:
-                    additional_tracks = filter_tracks_by_mood(sp, raw_tracks, mood_features, limit)
-                    # Add tracks we don't already have
-                    existing_ids = {t['id'] for t in tracks}
-                    for track in additional_tracks:
-                        if track['id'] not in existing_ids:
-                            tracks.append(track)
-                            if len(tracks) >= limit:
-                                break
-            except Exception as e:
-                st.warning(f"Broader search failed: {e}")
-        
-        # Attempt 3: If still not enough, use generic mood keyword
-        if len(tracks) < limit:
-            st.info("🔄 Using broader mood search...")
-            try:
-                generic_query = selected_mood.lower()
-                results = sp.search(
-                    q=generic_query,
-                    limit=50,
-                    type='track',
-                    market='US'
-                )
-                raw_tracks = results.get('tracks', {}).get('items', [])
-                if raw_tracks:
-                    additional_tracks = filter_tracks_by_mood(sp, raw_tracks, mood_features, limit)
-                    # Add tracks we don't already have
-                    existing_ids = {t['id'] for t in tracks}
-                    for track in additional_tracks:
-                        if track['id'] not in existing_ids:
-                            tracks.append(track)
-                            if len(tracks) >= limit:
-                                break
-            except Exception as e:
-                st.warning(f"Generic search failed: {e}")
-        
-        # Attempt 4: Last resort if still not enough - search with genre + mood
-        if len(tracks) < limit:
-            st.info("🔄 Trying genre-based search...")
-            try:
-                # Use first mood-specific genre
-                genre_query = f"genre:{seed_genres[0]}" if seed_genres else "pop"
-                results = sp.search(
-                    q=f"{genre_query} {search_query}",
-                    limit=50,
-                    type='track',
-                    market='US'
-                )
-                raw_tracks = results.get('tracks', {}).get('items', [])
-                if raw_tracks:
-                    additional_tracks = filter_tracks_by_mood(sp, raw_tracks, mood_features, limit)
-                    # Add tracks we don't already have
-                    existing_ids = {t['id'] for t in tracks}
-                    for track in additional_tracks:
-                        if track['id'] not in existing_ids:
-                            tracks.append(track)
-                            if len(tracks) >= limit:
-                                break
-            except Exception as e:
-                st.warning(f"Genre search failed: {e}")
-        
-        # Attempt 5: Absolute last resort - return whatever we found, no filtering
-        if len(tracks) < limit:
-            st.info("🔄 Finding popular tracks as fallback...")
-            try:
-                results = sp.search(
-                    q=search_query,
-                    limit=limit * 2,
-                    type='track',
-                    market='US'
-                )
-                raw_tracks = results.get('tracks', {}).get('items', [])
-                if raw_tracks:
-                    st.warning("⚠️ Showing unfiltered results (audio feature validation unavailable).")
-                    tracks = raw_tracks[:limit]
-            except Exception as e:
-                st.error(f"All search attempts failed: {e}")
-        
-        if not tracks:
+        except LookupError:
             st.error("❌ Unable to find any tracks. Please try again later or adjust your settings.")
             return []
         
@@ -901,7 +1235,7 @@ def get_recommendations(sp, mood_features, selected_mood="Happy", limit=10, use_
         st.success(f"✨ Found {len(tracks)} tracks matching {selected_mood} mood characteristics!")
         return tracks
         
-    except spotipy.exceptions.SpotifyException as e:
+    except SpotifyException as e:
         st.error(f"❌ Spotify API error ({e.http_status}): {e.msg}")
         # Last ditch effort - return empty but don't crash
         return []
@@ -910,6 +1244,15 @@ def get_recommendations(sp, mood_features, selected_mood="Happy", limit=10, use_
         return []
 
 
+def add_tracks_to_playlist(sp, playlist_id, items, batch_size=100):
+    """
+    Add tracks (IDs or URIs) to a playlist in batches of at most 100, the Spotify per-request limit.
+    Rate-limited (429) responses are retried by the shared HTTP session, honouring Retry-After.
+    """
+    for start in range(0, len(items), batch_size):
+        sp.playlist_add_items(playlist_id, items[start:start + batch_size])
+
+
 def create_playlist_from_tracks(sp, user_id, mood, tracks):
     """Create a private playlist with the recommended tracks"""
     try:
@@ -927,9 +1270,8 @@ def create_playlist_from_tracks(sp, user_id, mood, tracks):
         # Get track URIs
         track_uris = [track["uri"] for track in tracks if track.get("uri")]
         
-        # Add tracks to playlist (Spotify allows up to 100 at once)
-        if track_uris:
-            sp.playlist_add_items(playlist["id"], track_uris)
+        # Add tracks to playlist (Spotify allows up to 100 per request)
+        add_tracks_to_playlist(sp, playlist["id"], track_uris)
         
         return playlist
     except Exception as e:
@@ -937,34 +1279,155 @@ def create_playlist_from_tracks(sp, user_id, mood, tracks):
         return None
 
 
-def display_track(track, index):
-    """Display a single track with preview and link"""
-    col1, col2 = st.columns([1, 3])
+def _thumbnail_url(images, min_width=150):
+    """Pick the smallest album image that is still at least min_width pixels wide"""
+    # Spotify lists renditions largest first (640, 300, 64)
+    for image in reversed(images):
+        if (image.get("width") or 0) >= min_width:
+            return image["url"]
+    return images[0]["url"]
+
+
+def _to_track_card(track):
+    """Flatten a nested Spotify track dict into a TrackCard once, before rendering"""
+    album = track["album"]
+    images = album["images"]
+    return TrackCard(
+        name=track["name"],
+        artists=", ".join(a["name"] for a in track["artists"]),
+        album=album["name"],
+        image_url=_thumbnail_url(images) if images else None,
+        url=track["external_urls"]["spotify"],
+        preview_url=track.get("preview_url")
+    )
+
+
+def _image_loading_attrs(index):
+    """Browser loading hints for the album art of the index-th card (1-based)"""
+    if index <= EAGER_IMAGE_COUNT:
+        return 'loading="eager" fetchpriority="high"'
+    return 'loading="lazy"'
+
+
+def _track_card_html(card, index):
+    """Build the HTML for one track card (album art, title, artists, album, Spotify link, preview)"""
+    return TRACK_CARD_TEMPLATE.format_map({
+        "index": index,
+        "image": (
+            f'<img src="{escape(card.image_url)}" width="150" {_image_loading_attrs(index)} decoding="async">'
+            if card.image_url else ""
+        ),
+        "name": escape(card.name),
+        "artists": escape(card.artists),
+        "album": escape(card.album),
+        "url": escape(card.url),
+        "preview": (
+            f'<audio controls preload="none" src="{escape(card.preview_url)}" style="width:100%"></audio>'
+            if card.preview_url else "<p><small>🔇 No preview available</small></p>"
+        )
+    })
+
+
+@st.cache_data(show_spinner=False)
+def _mood_grid_html(moods):
+    """Build the welcome screen's "Available Moods" grid once; moods is a tuple of (name, description)"""
+    return (
+        '<div style="display:grid;grid-template-columns:repeat(3,1fr);gap:1rem">'
+        + "".join(
+            f'<div><strong>{escape(name)}</strong><br><small style="opacity:0.6">{escape(description)}</small></div>'
+            for name, description in moods
+        )
+        + '</div>'
+    )
+
+
+def _track_list_html(tracks):
+    """
+    HTML for a whole track list, memoized per session on the list's track IDs so
+    reruns (chat history, fragment reruns) reuse it instead of rebuilding every card.
+    """
+    memo = st.session_state.setdefault("track_list_html", {})
+    key = tuple(track.get("id") for track in tracks)
+    html = memo.get(key)
+    if html is None:
+        html = TRACK_LIST_TEMPLATE.format(
+            cards="".join(_track_card_html(_to_track_card(track), idx) for idx, track in enumerate(tracks, 1))
+        )
+        memo[key] = html
+        # Keep the memo bounded; dicts preserve insertion order, so this drops the oldest list
+        if len(memo) > 64:
+            del memo[next(iter(memo))]
+    return html
+
+
+def display_tracks(tracks, container=None):
+    """
+    Display a list of tracks with a single markdown call.
+    Previews are native <audio preload="none"> tags inside each card, so the browser
+    only fetches audio when play is pressed. Everything is written into a single
+    container (a fresh st.container() by default). Returns the rendered HTML.
+    """
+    if container is None:
+        container = st.container()
     
-    with col1:
-        # Display album art
-        if track["album"]["images"]:
-            st.image(track["album"]["images"][0]["url"], width=150)
+    html = _track_list_html(tracks)
+    container.markdown(html, unsafe_allow_html=True)
+    return html
+
+
+def display_tracks_table(tracks, container=None):
+    """Display tracks as one virtualized st.dataframe (art, title, artists, album, links)"""
+    if container is None:
+        container = st.container()
+    cards = [_to_track_card(track) for track in tracks]
     
-    with col2:
-        # Track info
-        st.markdown(f"### {index}. {track['name']}")
-        st.markdown(f"**Artist(s):** {', '.join([artist['name'] for artist in track['artists']])}")
-        st.markdown(f"**Album:** {track['album']['name']}")
-        
-        # Links and preview
-        col_link, col_preview = st.columns(2)
-        
-        with col_link:
-            st.markdown(f"🔗 [Open in Spotify]({track['external_urls']['spotify']})")
-        
-        with col_preview:
-            if track.get("preview_url"):
-                st.audio(track["preview_url"], format="audio/mp3")
-            else:
-                st.caption("🔇 No preview available")
-        
-        st.divider()
+    # Column-oriented dict: st.dataframe converts it to Arrow without a per-row loop on our side
+    container.dataframe(
+        {
+            "#": range(1, len(cards) + 1),
+            "Art": [card.image_url for card in cards],
+            "Title": [card.name for card in cards],
+            "Artist(s)": [card.artists for card in cards],
+            "Album": [card.album for card in cards],
+            "Spotify": [card.url for card in cards],
+            "Preview": [card.preview_url for card in cards]
+        },
+        column_config={
+            "Art": st.column_config.ImageColumn("Art"),
+            "Spotify": st.column_config.LinkColumn("Spotify", display_text="Open"),
+            "Preview": st.column_config.LinkColumn("Preview", display_text="▶️ Play")
+        },
+        hide_index=True,
+        use_container_width=True
+    )
+
+
+def _render_cache_debug():
+    """Show what the Streamlit and session caches are holding, with a button to clear them"""
+    # Streamlit has no public stats API, so read the providers it uses for its own
+    # stats page; skip them quietly if a Streamlit upgrade moves them
+    try:
+        from streamlit.runtime.caching.cache_data_api import _data_caches
+        from streamlit.runtime.caching.cache_resource_api import _resource_caches
+        
+        for label, provider in (("st.cache_data", _data_caches), ("st.cache_resource", _resource_caches)):
+            sizes = {}
+            for stat in provider.get_stats():
+                sizes[stat.cache_name] = sizes.get(stat.cache_name, 0) + stat.byte_length
+            st.caption(f"**{label}** ({len(sizes)} functions)")
+            for name, byte_length in sorted(sizes.items()):
+                st.caption(f"{name}: {byte_length / 1024:.1f} KB")
+    except (ImportError, AttributeError):
+        st.caption("Streamlit cache stats unavailable in this version.")
+    
+    st.caption(f"**Session:** {len(st.session_state.get('audio_features_cache', {}))} audio features, "
+               f"{len(st.session_state.get('liked_track_map', {}))} liked tracks")
+    
+    if st.button("🧹 Clear caches", key="clear_caches"):
+        st.cache_data.clear()
+        for key in ("audio_features_cache", "liked_features"):
+            st.session_state.pop(key, None)
+        st.rerun()
 
 
 def main():
@@ -980,19 +1443,11 @@ def main():
         if 'selected_gpt_model' not in st.session_state:
             st.session_state.selected_gpt_model = "gpt-3.5-turbo"
         
-        model_options = {
-            "gpt-3.5-turbo": "GPT-3.5 Turbo (Fast & Cheap)",
-            "gpt-4": "GPT-4 (Most Accurate)",
-            "gpt-4-turbo": "GPT-4 Turbo (Fast & Smart)",
-            "gpt-4o": "GPT-4o (Latest & Best)",
-            "gpt-4o-mini": "GPT-4o Mini (Balanced)"
-        }
-        
         selected_model = st.selectbox(
             "Choose GPT Model:",
-            options=list(model_options.keys()),
-            format_func=lambda x: model_options[x],
-            index=list(model_options.keys()).index(st.session_state.selected_gpt_model),
+            options=GPT_MODEL_NAMES,
+            format_func=GPT_MODEL_OPTIONS.__getitem__,
+            index=GPT_MODEL_NAMES.index(st.session_state.selected_gpt_model),
             help="Select which OpenAI model to use for understanding your music requests"
         )
         
@@ -1000,22 +1455,17 @@ def main():
         st.session_state.selected_gpt_model = selected_model
         
         # Show model info
-        model_info = {
-            "gpt-3.5-turbo": "💰 ~$0.002/1K tokens | ⚡ Fastest | Good for most requests",
-            "gpt-4": "💰 ~$0.03/1K tokens | 🎯 Most accurate | Best understanding",
-            "gpt-4-turbo": "💰 ~$0.01/1K tokens | ⚡ Fast | Great balance",
-            "gpt-4o": "💰 ~$0.005/1K tokens | 🚀 Latest | Best overall",
-            "gpt-4o-mini": "💰 ~$0.0015/1K tokens | ⚡ Fast | Cost-effective"
-        }
-        
-        st.caption(model_info[selected_model])
+        st.caption(GPT_MODEL_INFO[selected_model])
         
         st.divider()
         
         # About section
         st.subheader("ℹ️ About")
         st.caption("Spotify Mood Recommender with AI-powered chatbot")
-        st.caption(f"Current Model: **{model_options[selected_model]}**")
+        st.caption(f"Current Model: **{GPT_MODEL_OPTIONS[selected_model]}**")
+        
+        if st.checkbox("🐞 Cache debug info", key="show_cache_debug"):
+            _render_cache_debug()
     
     # Handle OAuth callback redirect
     query_params = st.query_params
@@ -1051,7 +1501,7 @@ def main():
         sp, auth_manager = get_spotify_client()
         
         # Show current configuration in debug mode (only in sidebar)
-        redirect_uri = os.getenv('SPOTIPY_REDIRECT_URI', '(missing)')
+        redirect_uri = SPOTIPY_REDIRECT_URI if SPOTIPY_REDIRECT_URI is not None else '(missing)'
         
         # Check if user needs to authenticate
         token_info = auth_manager.get_cached_token()
@@ -1121,7 +1571,7 @@ def main():
                     """)
             
             # Use client credentials fallback for non-logged-in users
-            sp = get_spotify_client_credentials_only()
+            sp = get_spotify_client_credentials_only(*_spotify_credentials())
             use_liked_songs = False
         else:
             st.session_state.logged_in = True
@@ -1135,12 +1585,12 @@ def main():
             # Fetch liked songs if not already fetched
             if not st.session_state.liked_track_ids:
                 with st.spinner("Fetching your Liked Songs..."):
-                    st.session_state.liked_track_ids = get_user_liked_track_ids(sp, max_ids=300)
+                    load_liked_tracks(sp, max_ids=300)
                 if st.session_state.liked_track_ids:
                     st.success(f"✅ Loaded {len(st.session_state.liked_track_ids)} Liked Songs!")
     except Exception as e:
         st.warning(f"OAuth not available: {e}. Using basic mode.")
-        sp = get_spotify_client_credentials_only()
+        sp = get_spotify_client_credentials_only(*_spotify_credentials())
         use_liked_songs = False
     
     # Sidebar for mood selection and feature customization
@@ -1168,7 +1618,7 @@ def main():
                 st.markdown(f"[View on Spotify]({profile['url']})")
             
             if st.button("🔄 Refresh", key="refresh_profile"):
-                st.session_state.liked_track_ids = get_user_liked_track_ids(sp, max_ids=300)
+                load_liked_tracks(sp, max_ids=300)
                 st.session_state.user_profile = get_user_profile(sp)
                 st.rerun()
             
@@ -1182,70 +1632,72 @@ def main():
         # Mood selection
         selected_mood = st.selectbox(
             "Choose a mood:",
-            options=list(MOOD_PRESETS.keys()),
+            options=MOOD_NAMES,
             help="Select the mood that matches how you're feeling"
         )
+        mood_idx = MOOD_INDEX[selected_mood]
         
-        st.caption(MOOD_PRESETS[selected_mood]["description"])
+        st.caption(MOOD_DESCRIPTIONS[mood_idx])
         st.divider()
         
-        # Feature customization
-        st.header("🎚️ Customize Features")
-        st.caption("Fine-tune the audio characteristics")
-        
-        # Get preset values
-        preset = MOOD_PRESETS[selected_mood]
-        
-        # Sliders for each feature
-        valence = st.slider(
-            "Valence (Positivity)",
-            min_value=0.0,
-            max_value=1.0,
-            value=preset["valence"],
-            step=0.1,
-            help="Musical positiveness (0 = sad, 1 = happy)"
-        )
-        
-        energy = st.slider(
-            "Energy",
-            min_value=0.0,
-            max_value=1.0,
-            value=preset["energy"],
-            step=0.1,
-            help="Intensity and activity level"
-        )
-        
-        danceability = st.slider(
-            "Danceability",
-            min_value=0.0,
-            max_value=1.0,
-            value=preset["danceability"],
-            step=0.1,
-            help="How suitable the track is for dancing"
-        )
-        
-        tempo = st.slider(
-            "Tempo (BPM)",
-            min_value=60,
-            max_value=200,
-            value=preset["tempo"],
-            step=5,
-            help="Speed of the track in beats per minute"
-        )
-        
-        st.divider()
-        
-        # Number of recommendations
-        num_tracks = st.slider(
-            "Number of tracks",
-            min_value=5,
-            max_value=20,
-            value=10,
-            help="How many recommendations to show"
-        )
-        
-        # Get recommendations button
-        get_recs = st.button("🎲 Get Recommendations", type="primary", use_container_width=True)
+        # Feature customization - inside a form so slider drags don't rerun the script
+        with st.form("mood_form", border=False):
+            st.header("🎚️ Customize Features")
+            st.caption("Fine-tune the audio characteristics")
+            
+            # Get preset values
+            preset_valence, preset_energy, preset_danceability, preset_tempo = MOOD_VECTORS[mood_idx].tolist()
+            
+            # Sliders for each feature
+            valence = st.slider(
+                "Valence (Positivity)",
+                min_value=0.0,
+                max_value=1.0,
+                value=preset_valence,
+                step=0.1,
+                help="Musical positiveness (0 = sad, 1 = happy)"
+            )
+            
+            energy = st.slider(
+                "Energy",
+                min_value=0.0,
+                max_value=1.0,
+                value=preset_energy,
+                step=0.1,
+                help="Intensity and activity level"
+            )
+            
+            danceability = st.slider(
+                "Danceability",
+                min_value=0.0,
+                max_value=1.0,
+                value=preset_danceability,
+                step=0.1,
+                help="How suitable the track is for dancing"
+            )
+            
+            tempo = st.slider(
+                "Tempo (BPM)",
+                min_value=60,
+                max_value=200,
+                value=int(preset_tempo),
+                step=5,
+                help="Speed of the track in beats per minute"
+            )
+            
+            st.divider()
+            
+            # Number of recommendations
+            num_tracks = st.slider(
+                "Number of tracks",
+                min_value=5,
+                max_value=20,
+                value=10,
+                help="How many recommendations to show"
+            )
+            
+            # Get recommendations button
+            get_recs = st.form_submit_button("🎲 Get Recommendations", type="primary", use_container_width=True)
     
     # Main content area - Use session state for tab selection
     st.divider()
@@ -1272,6 +1724,11 @@ def main():
 
 def _display_manual_mode(get_recs, selected_mood, valence, energy, danceability, tempo, num_tracks, sp, is_logged_in, liked_track_ids):
     """Display the original manual mood selection interface"""
+    # Everything the recommendations depend on; re-submitting unchanged settings reuses the last results
+    request_key = (selected_mood, valence, energy, danceability, tempo, num_tracks, is_logged_in)
+    if get_recs and request_key == st.session_state.get("manual_results_key") and st.session_state.get("manual_results"):
+        get_recs = False
+    
     if get_recs:
         # Prepare feature dictionary
         mood_features = {
@@ -1292,48 +1749,55 @@ def _display_manual_mode(get_recs, selected_mood, valence, energy, danceability,
                 liked_track_ids=liked_track_ids
             )
         
-        if tracks:
-            st.success(f"✨ Found {len(tracks)} tracks for your {selected_mood} mood!")
-            
-            # Add save to playlist button (only if logged in)
-            if is_logged_in and st.session_state.user_profile:
-                if st.button("💾 Save these tracks as a private playlist"):
-                    try:
-                        me = sp.current_user()
-                        user_id = me["id"]
-                        name = f"Mood2Music – {selected_mood}"
-                        pl = sp.user_playlist_create(user=user_id, name=name, public=False, description="Created by Mood2Music")
-                        sp.playlist_add_items(pl["id"], [t["id"] for t in tracks if t.get("id")])
-                        st.success(f"Saved! Open in Spotify: {pl['external_urls']['spotify']}")
-                    except Exception as e:
-                        st.error(f"Failed to create playlist: {e}")
-            
-            # Display feature summary
-            with st.expander("📊 Current Audio Features"):
-                col1, col2, col3, col4 = st.columns(4)
-                col1.metric("Valence", f"{valence:.1f}")
-                col2.metric("Energy", f"{energy:.1f}")
-                col3.metric("Danceability", f"{danceability:.1f}")
-                col4.metric("Tempo", f"{tempo} BPM")
-            
-            st.divider()
-            
-            # Display tracks
-            for idx, track in enumerate(tracks, 1):
-                display_track(track, idx)
-        else:
+        # Keep the results in session state so reruns triggered elsewhere
+        # (other widgets, the save button) don't lose or re-fetch them
+        st.session_state.manual_results = (tracks, selected_mood, mood_features) if tracks else None
+        st.session_state.manual_results_key = request_key
+        if not tracks:
             st.warning("No tracks found. Try adjusting the features!")
-    else:
+    
+    if st.session_state.get("manual_results"):
+        _display_manual_results(sp, *st.session_state.manual_results, is_logged_in)
+    elif not get_recs:
         # Welcome message
         st.info("👈 Select a mood and click 'Get Recommendations' to start discovering music!")
         
         # Display mood presets info
         st.header("Available Moods")
-        cols = st.columns(3)
-        for idx, (mood, preset) in enumerate(MOOD_PRESETS.items()):
-            with cols[idx % 3]:
-                st.markdown(f"**{mood}**")
-                st.caption(preset["description"])
+        st.html(_mood_grid_html(MOOD_CARDS))
+
+
+@st.fragment
+def _display_manual_results(sp, tracks, selected_mood, mood_features, is_logged_in):
+    """Render the last fetched recommendations as a fragment so its own widgets only rerun this section"""
+    st.success(f"✨ Found {len(tracks)} tracks for your {selected_mood} mood!")
+    
+    # Add save to playlist button (only if logged in)
+    if is_logged_in and st.session_state.user_profile:
+        if st.button("💾 Save these tracks as a private playlist"):
+            try:
+                me = sp.current_user()
+                user_id = me["id"]
+                name = f"Mood2Music – {selected_mood}"
+                pl = sp.user_playlist_create(user=user_id, name=name, public=False, description="Created by Mood2Music")
+                add_tracks_to_playlist(sp, pl["id"], [t["id"] for t in tracks if t.get("id")])
+                st.success(f"Saved! Open in Spotify: {pl['external_urls']['spotify']}")
+            except Exception as e:
+                st.error(f"Failed to create playlist: {e}")
+    
+    # Display feature summary
+    with st.expander("📊 Current Audio Features"):
+        st.html(FEATURE_SUMMARY_TEMPLATE.format_map(mood_features))
+    
+    st.divider()
+    
+    # Display tracks (the toggle only reruns this fragment)
+    compact = st.toggle("Compact table view", key="compact_results")
+    results_container = st.container()
+    if compact:
+        display_tracks_table(tracks, results_container)
+    else:
+        display_tracks(tracks, results_container)
 
 
 def _display_chatbot_mode(sp, is_logged_in, liked_track_ids):
@@ -1381,15 +1845,11 @@ def _display_chatbot_mode(sp, is_logged_in, liked_track_ids):
                 st.markdown(message["content"])
                 
                 # Display tracks if they exist in the message
-                if "tracks" in message:
-                    for idx, track in enumerate(message["tracks"], 1):
-                        display_track(track, idx)
+                if "tracks_html" in message:
+                    st.markdown(message["tracks_html"], unsafe_allow_html=True)
     
     # Chat input
     if prompt := st.chat_input("What kind of music are you looking for?"):
-        # Add user message to chat
-        st.session_state.chat_messages.append({"role": "user", "content": prompt})
-        
         # Display user message
         with st.chat_message("user"):
             st.markdown(prompt)
@@ -1403,37 +1863,37 @@ def _display_chatbot_mode(sp, is_logged_in, liked_track_ids):
                 if artist_name:
                     # Artist-specific search
                     try:
-                        results = sp.search(q=f"artist:{artist_name}", limit=10, type='track', market='US')
-                        tracks = results.get('tracks', {}).get('items', [])
+                        # Spotify search is case-insensitive, so normalize the cache key
+                        tracks = _cached_artist_search(sp, artist_name.strip().lower(), 10)
                         
                         if tracks:
                             response = f"🎵 Found {len(tracks)} songs by {artist_name}!"
                             st.markdown(f"{gpt_explanation}\n\n{response}")
                             
                             # Display tracks
-                            for idx, track in enumerate(tracks, 1):
-                                display_track(track, idx)
+                            tracks_html = display_tracks(tracks)
                             
-                            # Save assistant message with tracks
-                            st.session_state.chat_messages.append({
+                            # Keep only the rendered track list; the full track dicts
+                            # (market lists, nested album data) aren't kept in history
+                            reply = {
                                 "role": "assistant",
                                 "content": f"{gpt_explanation}\n\n{response}",
-                                "tracks": tracks
-                            })
+                                "tracks_html": tracks_html
+                            }
                         else:
                             response = f"😔 Couldn't find any songs by '{artist_name}'. Try checking the spelling or try a different artist!"
                             st.markdown(response)
-                            st.session_state.chat_messages.append({
+                            reply = {
                                 "role": "assistant",
                                 "content": response
-                            })
+                            }
                     except Exception as e:
                         response = f"❌ Error searching for artist: {e}"
                         st.markdown(response)
-                        st.session_state.chat_messages.append({
+                        reply = {
                             "role": "assistant",
                             "content": response
-                        })
+                        }
                 else:
                     # Mood-based recommendation
                     mood_features = MOOD_PRESETS[mood_name].copy()
@@ -1441,7 +1901,8 @@ def _display_chatbot_mode(sp, is_logged_in, liked_track_ids):
                     # Try getting recommendations from liked songs first
                     tracks = []
                     if liked_track_ids and len(liked_track_ids) >= 5:
-                        tracks = filter_liked_songs_by_mood(sp, liked_track_ids, mood_features, limit=10)
+                        feature_ids, feature_matrix = get_liked_feature_matrix(sp, liked_track_ids)
+                        tracks = filter_liked_songs_by_mood(sp, feature_ids, feature_matrix, mood_features, limit=10)
                     
                     # If no tracks from liked songs, fall back to search
                     if not tracks:
@@ -1468,22 +1929,24 @@ def _display_chatbot_mode(sp, is_logged_in, liked_track_ids):
                         st.markdown(f"{gpt_explanation}\n\n{response}")
                         
                         # Display tracks
-                        for idx, track in enumerate(tracks, 1):
-                            display_track(track, idx)
+                        tracks_html = display_tracks(tracks)
                         
-                        # Save assistant message with tracks
-                        st.session_state.chat_messages.append({
+                        # Keep only the rendered track list in history
+                        reply = {
                             "role": "assistant",
                             "content": f"{gpt_explanation}\n\n{response}",
-                            "tracks": tracks
-                        })
+                            "tracks_html": tracks_html
+                        }
                     else:
                         response = f"😔 Sorry, I couldn't find any {mood_name.lower()} tracks. Try a different mood or be more specific!"
                         st.markdown(response)
-                        st.session_state.chat_messages.append({
+                        reply = {
                             "role": "assistant",
                             "content": response
-                        })
+                        }
+        
+        # Record the whole turn in one update once the reply is known
+        st.session_state.chat_messages.extend(({"role": "user", "content": prompt}, reply))
     
     # Add clear chat button
     if len(st.session_state.chat_messages) > 1:  # More than just welcome message
@@ -22,9 +22,16 @@ SPOTIFY APIs USED:
 """
 
 import os
+import hashlib
 import logging
-from typing import List, Optional, Dict, Any
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Dict, Any, Callable, Iterable, Tuple
 from dotenv import load_dotenv
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import spotipy
 from spotipy.oauth2 import SpotifyOAuth, SpotifyClientCredentials
 
@@ -39,6 +46,176 @@ load_dotenv()
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# 📚 CONSTANTS: Spotify page size and how many requests we keep in flight at once
+PAGE_SIZE = 50
+MAX_CONCURRENT_REQUESTS = 4
+
+# Most IDs Spotify accepts per audio-features / tracks request
+AUDIO_FEATURES_BATCH_SIZE = 100
+TRACKS_BATCH_SIZE = 50
+
+# Seconds to wait for Spotify before giving up on a request
+REQUEST_TIMEOUT = 10
+
+# Client-side request budget: steady rate (requests/second) and burst size
+RATE_LIMIT_PER_SECOND = 10
+RATE_LIMIT_BURST = 20
+
+# Cache lifetimes in seconds: profiles change rarely, track metadata and audio
+# features are effectively immutable, search results drift over time
+PROFILE_CACHE_TTL = 60 * 60
+TRACK_CACHE_TTL = 24 * 60 * 60
+SEARCH_CACHE_TTL = 10 * 60
+TRACK_CACHE_SIZE = 50_000
+SEARCH_CACHE_SIZE = 256
+
+
+class TTLCache:
+    """
+    Thread-safe in-memory cache whose entries expire after `ttl` seconds.
+    
+    📚 PATTERN: Read-through caching. Callers look up a key first and only hit
+    the API on a miss. When the cache is full the oldest entry is dropped
+    (dicts keep insertion order).
+    
+    Example:
+        >>> cache = TTLCache(maxsize=100, ttl=60)
+        >>> cache.set("track1", "features")
+        >>> cache.get("track1")
+        'features'
+    """
+    
+    def __init__(self, maxsize: int, ttl: float, clock: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data: Dict[Any, Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+    
+    def get(self, key: Any, default: Any = None) -> Any:
+        """Return the cached value, or default if missing or expired."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at <= self._clock():
+                del self._data[key]
+                return default
+            return value
+    
+    def set(self, key: Any, value: Any) -> None:
+        """Store a value, evicting the oldest entry if the cache is full."""
+        with self._lock:
+            self._data.pop(key, None)
+            if len(self._data) >= self.maxsize:
+                del self._data[next(iter(self._data))]
+            self._data[key] = (self._clock() + self.ttl, value)
+    
+    def clear(self) -> None:
+        """Remove every entry."""
+        with self._lock:
+            self._data.clear()
+    
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket rate limiter.
+    
+    📚 ALGORITHM: The bucket holds up to `capacity` tokens and refills at `rate`
+    tokens per second. Each request takes one token; when the bucket is empty
+    the caller sleeps until the next token arrives. Short bursts are allowed,
+    but the long-run rate never exceeds `rate`.
+    
+    Example:
+        >>> bucket = TokenBucket(rate=10, capacity=20)
+        >>> bucket.acquire()  # Returns immediately while tokens remain
+    """
+    
+    def __init__(
+        self,
+        rate: float,
+        capacity: int,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep
+    ):
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = float(capacity)
+        self._updated = clock()
+        self._lock = threading.Lock()
+    
+    def acquire(self) -> None:
+        """Take one token, blocking until one is available."""
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            
+            if self._tokens < 1:
+                wait = (1 - self._tokens) / self.rate
+                logger.debug(f"Rate limit reached, waiting {wait:.3f}s")
+                self._sleep(wait)
+                # Exactly one token has accrued by the time we wake up
+                self._tokens = 1.0
+                self._updated = now + wait
+            
+            self._tokens -= 1
+
+
+class RateLimitedAdapter(HTTPAdapter):
+    """
+    HTTPAdapter that takes a token from a TokenBucket before every request.
+    
+    📚 DESIGN: Throttling at the transport layer covers every spotipy call
+    (including concurrent ones) without wrapping each method. Retries for
+    429/5xx happen inside the adapter, after the token was taken.
+    """
+    
+    def __init__(self, limiter: TokenBucket, **kwargs):
+        self.limiter = limiter
+        super().__init__(**kwargs)
+    
+    def send(self, request, **kwargs):
+        self.limiter.acquire()
+        return super().send(request, **kwargs)
+
+
+def create_http_session() -> requests.Session:
+    """
+    Create a pooled HTTP session for all Spotify traffic.
+    
+    📚 CONNECTION REUSE: A shared session keeps TCP/TLS connections to
+    api.spotify.com and accounts.spotify.com alive between calls, so
+    back-to-back requests skip the handshake. Requests are throttled by a
+    token bucket so bursts stay under Spotify's rate limit, and transient
+    failures (429, 5xx) are retried with exponential backoff, honoring Retry-After.
+    
+    Returns:
+        requests.Session with a rate-limited, retrying, pooled HTTPS adapter mounted
+    """
+    retry = Retry(
+        total=5,
+        backoff_factor=0.3,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=frozenset(["GET", "POST", "PUT", "DELETE"])
+    )
+    adapter = RateLimitedAdapter(
+        TokenBucket(rate=RATE_LIMIT_PER_SECOND, capacity=RATE_LIMIT_BURST),
+        pool_connections=4,
+        pool_maxsize=32,
+        max_retries=retry
+    )
+    
+    session = requests.Session()
+    session.mount("https://", adapter)
+    return session
+
 
 class SpotifyClient:
     """
@@ -91,6 +268,15 @@ class SpotifyClient:
                 details={"hint": "Set SPOTIPY_CLIENT_ID and SPOTIPY_CLIENT_SECRET"}
             )
         
+        # Read-through caches for data that rarely or never changes
+        self._profile_cache = TTLCache(maxsize=1, ttl=PROFILE_CACHE_TTL)
+        self._features_cache = TTLCache(maxsize=TRACK_CACHE_SIZE, ttl=TRACK_CACHE_TTL)
+        self._track_cache = TTLCache(maxsize=TRACK_CACHE_SIZE, ttl=TRACK_CACHE_TTL)
+        self._search_cache = TTLCache(maxsize=SEARCH_CACHE_SIZE, ttl=SEARCH_CACHE_TTL)
+        
+        # One pooled session shared by the auth manager and the API client
+        self.session = create_http_session()
+        
         # Initialize spotipy client
         try:
             if use_oauth:
@@ -106,17 +292,27 @@ class SpotifyClient:
                     redirect_uri=self.redirect_uri,
                     scope="user-library-read user-top-read playlist-modify-private",
                     cache_path=".cache_streamlit",
-                    show_dialog=True
+                    show_dialog=True,
+                    requests_session=self.session
+                )
+                self.sp = spotipy.Spotify(
+                    auth_manager=auth_manager,
+                    requests_session=self.session,
+                    requests_timeout=REQUEST_TIMEOUT
                 )
-                self.sp = spotipy.Spotify(auth_manager=auth_manager)
                 self.auth_manager = auth_manager
                 logger.info("Spotify OAuth client initialized")
             else:
                 auth_manager = SpotifyClientCredentials(
                     client_id=self.client_id,
-                    client_secret=self.client_secret
+                    client_secret=self.client_secret,
+                    requests_session=self.session
+                )
+                self.sp = spotipy.Spotify(
+                    client_credentials_manager=auth_manager,
+                    requests_session=self.session,
+                    requests_timeout=REQUEST_TIMEOUT
                 )
-                self.sp = spotipy.Spotify(client_credentials_manager=auth_manager)
                 self.auth_manager = None
                 logger.info("Spotify Client Credentials client initialized")
                 
@@ -124,6 +320,15 @@ class SpotifyClient:
             logger.error(f"Failed to initialize Spotify client: {e}")
             raise AuthenticationError(f"Failed to initialize client: {str(e)}")
     
+    def close(self) -> None:
+        """
+        Close the pooled HTTP session and its open connections.
+        
+        Safe to call more than once; the client should not be used afterwards.
+        """
+        self.session.close()
+        logger.debug("Spotify HTTP session closed")
+    
     def is_authenticated(self) -> bool:
         """
         Check if user is authenticated (for OAuth mode only).
@@ -159,6 +364,10 @@ class SpotifyClient:
         📚 ERROR HANDLING: We catch specific Spotify exceptions and convert
         them to our custom exceptions with helpful messages.
         
+        📚 CACHING: The profile is cached for PROFILE_CACHE_TTL seconds, keyed on
+        a hash of the current access token, so a different signed-in account
+        never gets the previous user's profile.
+        
         Returns:
             UserProfile object with user information
             
@@ -166,6 +375,12 @@ class SpotifyClient:
             AuthenticationError: If user not authenticated
             APIError: If API request fails
         """
+        cache_key = self._profile_cache_key()
+        if cache_key is not None:
+            cached = self._profile_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
         try:
             logger.debug("Fetching user profile")
             user_data = self.sp.current_user()
@@ -179,6 +394,8 @@ class SpotifyClient:
             )
             
             logger.info(f"Retrieved profile for user: {profile.display_name}")
+            if cache_key is not None:
+                self._profile_cache.set(cache_key, profile)
             return profile
             
         except spotipy.exceptions.SpotifyException as e:
@@ -190,12 +407,31 @@ class SpotifyClient:
             logger.error(f"Unexpected error getting profile: {e}")
             raise APIError(f"Unexpected error: {str(e)}")
     
+    def _profile_cache_key(self) -> Optional[str]:
+        """
+        Hash of the current OAuth access token, used to key the profile cache.
+        
+        Returns:
+            SHA-256 hex digest of the token, or None when there is no user token
+            (the profile is then not cached)
+        """
+        if not self.auth_manager:
+            return None
+        
+        token_info = self.auth_manager.get_cached_token() or {}
+        access_token = token_info.get("access_token")
+        if not isinstance(access_token, str):
+            return None
+        return hashlib.sha256(access_token.encode()).hexdigest()
+    
     def get_liked_track_ids(self, max_tracks: int = 300) -> List[str]:
         """
         Get list of user's liked (saved) track IDs.
         
         📚 PAGINATION: Spotify returns results in pages of 50.
-        We loop through pages until we have enough tracks or run out.
+        The first page tells us the library size, so the remaining pages
+        (up to max_tracks) are requested by offset concurrently. If skipped
+        items (local files, podcasts) leave us short, we keep paging with next.
         
         Args:
             max_tracks: Maximum number of track IDs to retrieve
@@ -211,12 +447,23 @@ class SpotifyClient:
             logger.debug(f"Fetching up to {max_tracks} liked tracks")
             
             track_ids = []
-            results = self.sp.current_user_saved_tracks(limit=50)
+            results = self.sp.current_user_saved_tracks(limit=PAGE_SIZE)
             
             # Process first page
             track_ids.extend(self._extract_track_ids(results.get("items", [])))
             
-            # Process subsequent pages
+            # Fetch the remaining pages up to max_tracks in parallel
+            offsets = range(PAGE_SIZE, min(results.get("total", 0), max_tracks), PAGE_SIZE)
+            pages = self._fetch_concurrently(
+                lambda offset: self.sp.current_user_saved_tracks(limit=PAGE_SIZE, offset=offset),
+                offsets
+            )
+            for page in pages:
+                track_ids.extend(self._extract_track_ids(page.get("items", [])))
+            if pages:
+                results = pages[-1]
+            
+            # Process subsequent pages (only needed when skipped items left us short)
             while results.get("next") and len(track_ids) < max_tracks:
                 results = self.sp.next(results)
                 track_ids.extend(self._extract_track_ids(results.get("items", [])))
@@ -233,6 +480,41 @@ class SpotifyClient:
             logger.error(f"Unexpected error getting liked tracks: {e}")
             raise APIError(f"Unexpected error: {str(e)}")
     
+    def _fetch_concurrently(self, fetch: Callable[[Any], Any], args: Iterable[Any]) -> List[Any]:
+        """
+        Call fetch once per argument on a small thread pool.
+        
+        📚 CONCURRENCY: API calls are I/O-bound, so overlapping them cuts wall time
+        from the sum of the round-trips to roughly the slowest one. Results keep
+        the order of args, and the first exception raised by a call propagates.
+        
+        Args:
+            fetch: Function making one API call
+            args: One argument per call
+            
+        Returns:
+            List of results in the same order as args
+        """
+        args = list(args)
+        if len(args) <= 1:
+            return [fetch(arg) for arg in args]
+        
+        with ThreadPoolExecutor(max_workers=min(MAX_CONCURRENT_REQUESTS, len(args))) as pool:
+            return list(pool.map(fetch, args))
+    
+    def _batches(self, track_ids: List[str], size: int) -> List[List[str]]:
+        """Split IDs into consecutive lists of at most `size` items."""
+        return [track_ids[i:i + size] for i in range(0, len(track_ids), size)]
+    
+    def _uncached_ids(self, cache: TTLCache, track_ids: List[str]) -> List[str]:
+        """Unique IDs (in request order) that have no live entry in the cache."""
+        return list(dict.fromkeys(tid for tid in track_ids if cache.get(tid) is None))
+    
+    def _cached_values(self, cache: TTLCache, track_ids: List[str]) -> List[Any]:
+        """Cached values for the IDs in request order, skipping IDs without an entry."""
+        values = (cache.get(tid) for tid in track_ids)
+        return [value for value in values if value is not None]
+    
     def _extract_track_ids(self, items: List[Dict]) -> List[str]:
         """
         Extract valid track IDs from API response items.
@@ -271,40 +553,40 @@ class SpotifyClient:
         Get audio features for multiple tracks.
         
         📚 BATCH API CALLS: Spotify allows requesting up to 100 tracks at once.
-        Batching reduces API calls and improves performance.
+        Longer lists are split into batches of 100 that are requested concurrently.
+        
+        📚 CACHING: Audio features never change, so they are cached per track ID
+        and only the IDs missing from the cache are requested.
         
         Args:
-            track_ids: List of Spotify track IDs (max 100)
+            track_ids: List of Spotify track IDs (any length)
             
         Returns:
             List of AudioFeatures objects
             
         Raises:
-            ValidationError: If track_ids list is too long
             APIError: If API request fails
         """
-        if len(track_ids) > 100:
-            raise ValidationError("Cannot request more than 100 tracks at once")
-        
         try:
-            logger.debug(f"Fetching audio features for {len(track_ids)} tracks")
-            
-            features_data = self.sp.audio_features(track_ids)
-            
-            features_list = []
-            for data in features_data:
-                if not data:  # Some tracks may not have features
-                    continue
-                
-                features = AudioFeatures(
-                    track_id=data.get("id", ""),
-                    valence=data.get("valence", 0.5),
-                    energy=data.get("energy", 0.5),
-                    danceability=data.get("danceability", 0.5),
-                    tempo=data.get("tempo", 120.0)
-                )
-                features_list.append(features)
+            missing = self._uncached_ids(self._features_cache, track_ids)
+            logger.debug(f"Fetching audio features for {len(missing)} of {len(track_ids)} tracks")
+            
+            batches = self._batches(missing, AUDIO_FEATURES_BATCH_SIZE)
+            for features_data in self._fetch_concurrently(self.sp.audio_features, batches):
+                for data in features_data:
+                    if not data:  # Some tracks may not have features
+                        continue
+                    
+                    features = AudioFeatures(
+                        track_id=data.get("id", ""),
+                        valence=data.get("valence", 0.5),
+                        energy=data.get("energy", 0.5),
+                        danceability=data.get("danceability", 0.5),
+                        tempo=data.get("tempo", 120.0)
+                    )
+                    self._features_cache.set(features.track_id, features)
             
+            features_list = self._cached_values(self._features_cache, track_ids)
             logger.info(f"Retrieved audio features for {len(features_list)} tracks")
             return features_list
             
@@ -319,33 +601,34 @@ class SpotifyClient:
         """
         Get full track details for multiple tracks.
         
+        📚 CACHING: Track metadata is cached per track ID for TRACK_CACHE_TTL
+        seconds; only IDs missing from the cache are requested, in concurrent
+        batches of 50 (the Spotify limit per request).
+        
         Args:
-            track_ids: List of Spotify track IDs (max 50)
+            track_ids: List of Spotify track IDs (any length)
             
         Returns:
             List of Track objects
             
         Raises:
-            ValidationError: If track_ids list is too long
             APIError: If API request fails
         """
-        if len(track_ids) > 50:
-            raise ValidationError("Cannot request more than 50 tracks at once")
-        
         try:
-            logger.debug(f"Fetching details for {len(track_ids)} tracks")
-            
-            tracks_data = self.sp.tracks(track_ids)
-            
-            tracks = []
-            for data in tracks_data.get("tracks", []):
-                if not data:
-                    continue
-                
-                track = self._parse_track(data)
-                if track:
-                    tracks.append(track)
-            
+            missing = self._uncached_ids(self._track_cache, track_ids)
+            logger.debug(f"Fetching details for {len(missing)} of {len(track_ids)} tracks")
+            
+            batches = self._batches(missing, TRACKS_BATCH_SIZE)
+            for tracks_data in self._fetch_concurrently(self.sp.tracks, batches):
+                for data in tracks_data.get("tracks", []):
+                    if not data:
+                        continue
+                    
+                    track = self._parse_track(data)
+                    if track:
+                        self._track_cache.set(track.track_id, track)
+            
+            tracks = self._cached_values(self._track_cache, track_ids)
             logger.info(f"Retrieved details for {len(tracks)} tracks")
             return tracks
             
@@ -360,6 +643,9 @@ class SpotifyClient:
         """
         Search for tracks by query string.
         
+        📚 CACHING: Results are cached per (query, limit, market) for
+        SEARCH_CACHE_TTL seconds.
+        
         Args:
             query: Search query string
             limit: Maximum number of results (max 50)
@@ -377,6 +663,11 @@ class SpotifyClient:
         if not query.strip():
             raise ValidationError("Search query cannot be empty")
         
+        cache_key = (query, limit, market)
+        cached = self._search_cache.get(cache_key)
+        if cached is not None:
+            return list(cached)
+        
         try:
             logger.debug(f"Searching tracks with query: {query}")
             
@@ -389,6 +680,7 @@ class SpotifyClient:
                     tracks.append(track)
             
             logger.info(f"Found {len(tracks)} tracks for query: {query}")
+            self._search_cache.set(cache_key, tuple(tracks))
             return tracks
             
         except spotipy.exceptions.SpotifyException as e:
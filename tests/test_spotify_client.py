@@ -10,8 +10,12 @@ Testing API client following patterns from test_client.py:
 
 import pytest
 from unittest.mock import Mock, patch, MagicMock
+import requests
 import spotipy
-from spotify.client import SpotifyClient
+from spotify.client import (
+    SpotifyClient, TokenBucket, RateLimitedAdapter, TTLCache,
+    create_http_session, REQUEST_TIMEOUT
+)
 from spotify.models import (
     UserProfile, Track, AudioFeatures, Playlist,
     AuthenticationError, APIError, ValidationError
@@ -78,6 +82,46 @@ class TestSpotifyClientInitialization:
         with pytest.raises(AuthenticationError, match="Failed to initialize client"):
             SpotifyClient()
     
+    @patch('spotify.client.SpotifyOAuth')
+    @patch('spotify.client.spotipy.Spotify')
+    @patch.dict('os.environ', {
+        'SPOTIPY_CLIENT_ID': 'test_id',
+        'SPOTIPY_CLIENT_SECRET': 'test_secret',
+        'SPOTIPY_REDIRECT_URI': 'http://localhost:8501'
+    })
+    def test_client_shares_pooled_session(self, mock_spotify, mock_oauth):
+        """Test that the auth manager and API client share one pooled session."""
+        client = SpotifyClient()
+        
+        assert isinstance(client.session, requests.Session)
+        assert mock_oauth.call_args.kwargs["requests_session"] is client.session
+        assert mock_spotify.call_args.kwargs["requests_session"] is client.session
+        assert mock_spotify.call_args.kwargs["requests_timeout"] == REQUEST_TIMEOUT
+    
+    @patch('spotify.client.SpotifyClientCredentials')
+    @patch('spotify.client.spotipy.Spotify')
+    @patch.dict('os.environ', {
+        'SPOTIPY_CLIENT_ID': 'test_id',
+        'SPOTIPY_CLIENT_SECRET': 'test_secret'
+    })
+    def test_close_closes_session(self, mock_spotify, mock_creds):
+        """Test that close() releases the pooled session."""
+        client = SpotifyClient(use_oauth=False)
+        client.session = Mock()
+        
+        client.close()
+        
+        client.session.close.assert_called_once()
+    
+    def test_create_http_session_retries_rate_limits(self):
+        """Test that the shared session retries 429 and 5xx responses."""
+        session = create_http_session()
+        retry = session.get_adapter("https://api.spotify.com").max_retries
+        
+        assert 429 in retry.status_forcelist
+        assert 503 in retry.status_forcelist
+        assert retry.respect_retry_after_header is True
+    
     def test_is_authenticated_with_oauth(self):
         """Test checking authentication status with OAuth."""
         with patch('spotify.client.SpotifyOAuth') as mock_oauth, \
@@ -141,6 +185,205 @@ class TestSpotifyClientInitialization:
                 client.get_authorize_url()
 
 
+class TestRateLimiting:
+    """Tests for the client-side token bucket rate limiter."""
+    
+    @pytest.fixture
+    def fake_time(self):
+        """A controllable clock whose sleep() advances time."""
+        now = [0.0]
+        sleeps = []
+        
+        def sleep(seconds):
+            sleeps.append(seconds)
+            now[0] += seconds
+        
+        return now, sleeps, (lambda: now[0]), sleep
+    
+    def test_burst_up_to_capacity_does_not_wait(self, fake_time):
+        """Test that a full bucket serves a burst without sleeping."""
+        now, sleeps, clock, sleep = fake_time
+        bucket = TokenBucket(rate=10, capacity=5, clock=clock, sleep=sleep)
+        
+        for _ in range(5):
+            bucket.acquire()
+        
+        assert sleeps == []
+    
+    def test_empty_bucket_waits_for_next_token(self, fake_time):
+        """Test that an empty bucket sleeps until one token has refilled."""
+        now, sleeps, clock, sleep = fake_time
+        bucket = TokenBucket(rate=10, capacity=2, clock=clock, sleep=sleep)
+        
+        for _ in range(4):
+            bucket.acquire()
+        
+        assert sleeps == pytest.approx([0.1, 0.1])
+    
+    def test_tokens_refill_over_time(self, fake_time):
+        """Test that idle time refills the bucket (up to capacity)."""
+        now, sleeps, clock, sleep = fake_time
+        bucket = TokenBucket(rate=10, capacity=2, clock=clock, sleep=sleep)
+        bucket.acquire()
+        bucket.acquire()
+        
+        now[0] += 10.0
+        bucket.acquire()
+        bucket.acquire()
+        
+        assert sleeps == []
+    
+    def test_adapter_takes_token_before_sending(self):
+        """Test that every request through the adapter acquires a token."""
+        limiter = Mock()
+        adapter = RateLimitedAdapter(limiter)
+        
+        with patch('spotify.client.HTTPAdapter.send', return_value="response") as mock_send:
+            response = adapter.send("request")
+        
+        assert response == "response"
+        limiter.acquire.assert_called_once()
+        mock_send.assert_called_once()
+    
+    def test_http_session_is_rate_limited(self):
+        """Test that the shared session mounts the rate-limited adapter."""
+        session = create_http_session()
+        
+        assert isinstance(session.get_adapter("https://api.spotify.com"), RateLimitedAdapter)
+
+
+class TestCaching:
+    """Tests for the TTL cache and the client's read-through caching."""
+    
+    @pytest.fixture
+    def mock_client(self):
+        """Create a mock Spotify client."""
+        with patch('spotify.client.SpotifyOAuth'), \
+             patch('spotify.client.spotipy.Spotify') as mock_sp, \
+             patch.dict('os.environ', {
+                 'SPOTIPY_CLIENT_ID': 'test_id',
+                 'SPOTIPY_CLIENT_SECRET': 'test_secret',
+                 'SPOTIPY_REDIRECT_URI': 'http://localhost:8501'
+             }):
+            client = SpotifyClient()
+            client.sp = mock_sp.return_value
+            yield client
+    
+    @staticmethod
+    def _features(track_id):
+        return {"id": track_id, "valence": 0.5, "energy": 0.5, "danceability": 0.5, "tempo": 100.0}
+    
+    @staticmethod
+    def _track(track_id):
+        return {
+            "id": track_id,
+            "name": f"Song {track_id}",
+            "artists": [{"name": "Artist"}],
+            "album": {"name": "Album", "images": []},
+            "external_urls": {"spotify": "url"},
+            "uri": f"spotify:track:{track_id}"
+        }
+    
+    def test_ttl_cache_expires_entries(self):
+        """Test that entries disappear once their TTL has passed."""
+        now = [0.0]
+        cache = TTLCache(maxsize=10, ttl=60, clock=lambda: now[0])
+        cache.set("key", "value")
+        
+        now[0] = 59.0
+        assert cache.get("key") == "value"
+        
+        now[0] = 60.0
+        assert cache.get("key") is None
+    
+    def test_ttl_cache_evicts_oldest_when_full(self):
+        """Test that a full cache drops its oldest entry."""
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.set("c", 3)
+        
+        assert cache.get("a") is None
+        assert cache.get("b") == 2
+        assert cache.get("c") == 3
+        assert len(cache) == 2
+    
+    def test_user_profile_is_cached(self, mock_client):
+        """Test that the profile is fetched only once per access token."""
+        mock_client.auth_manager.get_cached_token.return_value = {"access_token": "token-a"}
+        mock_client.sp.current_user.return_value = {"id": "user123", "display_name": "Test"}
+        
+        first = mock_client.get_user_profile()
+        second = mock_client.get_user_profile()
+        
+        assert first == second
+        mock_client.sp.current_user.assert_called_once()
+    
+    def test_user_profile_refetched_when_token_changes(self, mock_client):
+        """Test that a different account's token never gets the cached profile."""
+        mock_client.auth_manager.get_cached_token.return_value = {"access_token": "token-a"}
+        mock_client.sp.current_user.return_value = {"id": "user_a", "display_name": "User A"}
+        mock_client.get_user_profile()
+        
+        mock_client.auth_manager.get_cached_token.return_value = {"access_token": "token-b"}
+        mock_client.sp.current_user.return_value = {"id": "user_b", "display_name": "User B"}
+        profile = mock_client.get_user_profile()
+        
+        assert profile.user_id == "user_b"
+        assert mock_client.sp.current_user.call_count == 2
+    
+    def test_user_profile_not_cached_without_token(self, mock_client):
+        """Test that the profile is not cached when no user token is available."""
+        mock_client.auth_manager.get_cached_token.return_value = None
+        mock_client.sp.current_user.return_value = {"id": "user123", "display_name": "Test"}
+        
+        mock_client.get_user_profile()
+        mock_client.get_user_profile()
+        
+        assert mock_client.sp.current_user.call_count == 2
+    
+    def test_audio_features_only_fetches_missing_ids(self, mock_client):
+        """Test that cached audio features are not requested again."""
+        mock_client.sp.audio_features.side_effect = lambda ids: [self._features(tid) for tid in ids]
+        mock_client.get_audio_features(["track1", "track2"])
+        
+        features = mock_client.get_audio_features(["track2", "track3", "track1"])
+        
+        assert [f.track_id for f in features] == ["track2", "track3", "track1"]
+        mock_client.sp.audio_features.assert_called_with(["track3"])
+        assert mock_client.sp.audio_features.call_count == 2
+    
+    def test_fully_cached_audio_features_skip_api(self, mock_client):
+        """Test that no request is made when every ID is cached."""
+        mock_client.sp.audio_features.side_effect = lambda ids: [self._features(tid) for tid in ids]
+        mock_client.get_audio_features(["track1"])
+        
+        mock_client.get_audio_features(["track1"])
+        
+        mock_client.sp.audio_features.assert_called_once()
+    
+    def test_tracks_only_fetches_missing_ids(self, mock_client):
+        """Test that cached track details are not requested again."""
+        mock_client.sp.tracks.side_effect = lambda ids: {"tracks": [self._track(tid) for tid in ids]}
+        mock_client.get_tracks(["track1"])
+        
+        tracks = mock_client.get_tracks(["track1", "track2"])
+        
+        assert [t.track_id for t in tracks] == ["track1", "track2"]
+        mock_client.sp.tracks.assert_called_with(["track2"])
+    
+    def test_search_results_are_cached_per_query(self, mock_client):
+        """Test that repeating a search is served from the cache."""
+        mock_client.sp.search.return_value = {"tracks": {"items": [self._track("track1")]}}
+        
+        first = mock_client.search_tracks("happy")
+        second = mock_client.search_tracks("happy")
+        mock_client.search_tracks("happy", limit=10)
+        
+        assert first == second
+        assert mock_client.sp.search.call_count == 2
+
+
 class TestUserProfile:
     """Tests for user profile retrieval."""
     
@@ -283,6 +526,38 @@ class TestLikedTracks:
         assert len(track_ids) == 2
         mock_client.sp.next.assert_called_once()
     
+    def test_get_liked_track_ids_fetches_pages_by_offset(self, mock_client):
+        """Test that pages after the first are requested by offset, not via next."""
+        def saved_tracks(limit=50, offset=0):
+            return {
+                "items": [
+                    {"track": {"id": f"track{offset}", "type": "track", "is_local": False}}
+                ],
+                "total": 120,
+                "next": "next_page_url" if offset < 100 else None
+            }
+        mock_client.sp.current_user_saved_tracks.side_effect = saved_tracks
+        
+        track_ids = mock_client.get_liked_track_ids()
+        
+        assert track_ids == ["track0", "track50", "track100"]
+        mock_client.sp.next.assert_not_called()
+    
+    def test_get_liked_track_ids_offsets_stop_at_max_tracks(self, mock_client):
+        """Test that no pages beyond max_tracks are requested."""
+        mock_client.sp.current_user_saved_tracks.return_value = {
+            "items": [
+                {"track": {"id": "track1", "type": "track", "is_local": False}}
+            ],
+            "total": 1000,
+            "next": None
+        }
+        
+        mock_client.get_liked_track_ids(max_tracks=100)
+        
+        # First page plus the page at offset 50
+        assert mock_client.sp.current_user_saved_tracks.call_count == 2
+    
     def test_get_liked_track_ids_api_error(self, mock_client):
         """Test handling API error when getting liked tracks."""
         mock_client.sp.current_user_saved_tracks.side_effect = spotipy.exceptions.SpotifyException(
@@ -391,12 +666,19 @@ class TestAudioFeatures:
         assert features[0].track_id == "track1"
         assert features[0].valence == 0.8
     
-    def test_get_audio_features_too_many_tracks_raises_error(self, mock_client):
-        """Test that requesting too many tracks raises ValidationError."""
-        track_ids = [f"track{i}" for i in range(101)]
+    def test_get_audio_features_splits_into_batches_of_100(self, mock_client):
+        """Test that long ID lists are requested in batches of 100, keeping order."""
+        mock_client.sp.audio_features.side_effect = lambda ids: [
+            {"id": tid, "valence": 0.5, "energy": 0.5, "danceability": 0.5, "tempo": 100.0}
+            for tid in ids
+        ]
+        track_ids = [f"track{i}" for i in range(250)]
+        
+        features = mock_client.get_audio_features(track_ids)
         
-        with pytest.raises(ValidationError, match="Cannot request more than 100"):
-            mock_client.get_audio_features(track_ids)
+        assert [f.track_id for f in features] == track_ids
+        batch_sizes = sorted(len(call.args[0]) for call in mock_client.sp.audio_features.call_args_list)
+        assert batch_sizes == [50, 100, 100]
     
     def test_get_audio_features_skips_none_values(self, mock_client):
         """Test that None values in response are skipped."""
@@ -478,12 +760,37 @@ class TestTrackRetrieval:
         assert tracks[0].name == "Test Song"
         assert tracks[0].artists == ["Artist 1"]
     
-    def test_get_tracks_too_many_raises_error(self, mock_client):
-        """Test that requesting too many tracks raises ValidationError."""
-        track_ids = [f"track{i}" for i in range(51)]
+    def test_get_tracks_splits_into_batches_of_50(self, mock_client):
+        """Test that long ID lists are requested in batches of 50, keeping order."""
+        mock_client.sp.tracks.side_effect = lambda ids: {
+            "tracks": [
+                {
+                    "id": tid,
+                    "name": f"Song {tid}",
+                    "artists": [{"name": "Artist"}],
+                    "album": {"name": "Album", "images": []},
+                    "external_urls": {"spotify": "url"},
+                    "uri": f"spotify:track:{tid}"
+                }
+                for tid in ids
+            ]
+        }
+        track_ids = [f"track{i}" for i in range(120)]
+        
+        tracks = mock_client.get_tracks(track_ids)
+        
+        assert [t.track_id for t in tracks] == track_ids
+        batch_sizes = sorted(len(call.args[0]) for call in mock_client.sp.tracks.call_args_list)
+        assert batch_sizes == [20, 50, 50]
+    
+    def test_get_tracks_batch_error_raises_api_error(self, mock_client):
+        """Test that a failure in any concurrent batch surfaces as APIError."""
+        mock_client.sp.tracks.side_effect = spotipy.exceptions.SpotifyException(
+            500, "Server Error", "Internal error"
+        )
         
-        with pytest.raises(ValidationError, match="Cannot request more than 50"):
-            mock_client.get_tracks(track_ids)
+        with pytest.raises(APIError):
+            mock_client.get_tracks([f"track{i}" for i in range(120)])
     
     def test_get_tracks_api_error(self, mock_client):
         """Test handling API error when getting tracks."""